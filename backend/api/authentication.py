@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+DEFAULT_AUTH_TOKEN_TIMEOUT = 60 * 5
+JWT_USER_FIELDS = ('email', 'username', 'first_name', 'last_name',
+                   'is_staff')
+
+
+def token_key(key):
+    return f'auth_token:{key}'
+
+
+def forget_tokens(keys):
+    cache.delete_many([token_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который держит пару (пользователь, токен)
+    в кэше: запрос с известным токеном обходится без обращения к БД.
+
+    Запись удаляется при выходе (удалении токена), смене пароля
+    и деактивации пользователя, см. api.signals. Удаление видно
+    другим процессам только через общий кэш, поэтому без
+    SHARED_CACHE токен каждый раз проверяется по БД.
+    """
+    def authenticate_credentials(self, key):
+        if not getattr(settings, 'SHARED_CACHE', False):
+            return super().authenticate_credentials(key)
+        credentials = cache.get(token_key(key))
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(
+                token_key(key),
+                credentials,
+                getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT',
+                        DEFAULT_AUTH_TOKEN_TIMEOUT),
+            )
+        return credentials
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    Refresh-токен, который несет поля пользователя: access-токен
+    получает их копию, и по нему пользователь собирается без БД.
+    """
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in JWT_USER_FIELDS:
+            token[field] = getattr(user, field)
+        return token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Аутентификация по подписанному access-токену (режим AUTH_MODE=jwt).
+
+    Для чтения пользователь собирается из полей токена без запроса
+    к БД. Для изменяющих запросов он загружается из БД, чтобы
+    сохранение профиля не затирало поля значениями из токена.
+    Ключи старого формата (без точек) пропускаются дальше,
+    к CachedTokenAuthentication.
+    """
+    def authenticate(self, request):
+        self.request = request
+        return super().authenticate(request)
+
+    def get_raw_token(self, header):
+        raw_token = super().get_raw_token(header)
+        if raw_token is None or b'.' not in raw_token:
+            return None
+        return raw_token
+
+    def get_user(self, validated_token):
+        if self.request.method not in SAFE_METHODS:
+            return super().get_user(validated_token)
+        try:
+            claims = {field: validated_token[field]
+                      for field in JWT_USER_FIELDS}
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Токен не содержит данных пользователя.')
+        return self.user_model(
+            **{api_settings.USER_ID_FIELD: user_id}, is_active=True, **claims)
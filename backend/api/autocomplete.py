@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+from recipes.models import Ingredient
+
+from api.cache import get_version
+
+DEFAULT_AUTOCOMPLETE_LIMIT = 20
+
+
+class IngredientAutocomplete:
+    """
+    Отсортированный снимок справочника ингредиентов только для чтения.
+
+    Сначала возвращаются совпадения по началу названия, затем
+    по вхождению подстроки; регистр не учитывается.
+    """
+    version = None
+
+    def __init__(self, rows):
+        items = sorted(
+            (name.lower(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in rows
+        )
+        self.keys = tuple(item[0] for item in items)
+        self.items = tuple(
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in items
+        )
+
+    @classmethod
+    def from_database(cls):
+        return cls(Ingredient.objects.values_list(
+            'id', 'name', 'measurement_unit').iterator())
+
+    def search(self, query, limit):
+        query = query.strip().lower()
+        if not query:
+            return list(self.items[:limit])
+        keys = self.keys
+        position = bisect_left(keys, query)
+        end = position
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        found = list(range(position, min(end, position + limit)))
+        if len(found) < limit:
+            for index, key in enumerate(keys):
+                if query in key and not position <= index < end:
+                    found.append(index)
+                    if len(found) == limit:
+                        break
+        return [self.items[index] for index in found]
+
+
+_index = None
+_lock = Lock()
+
+
+def get_autocomplete():
+    """
+    Снимок перестраивается, когда меняется версия справочника в кэше,
+    поэтому правки из админки видны во всех процессах.
+    """
+    global _index
+    version = get_version(Ingredient)
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = IngredientAutocomplete.from_database()
+                _index.version = version
+            index = _index
+    return index
+
+
+def autocomplete_ingredients(query):
+    limit = getattr(
+        settings, 'INGREDIENT_AUTOCOMPLETE_LIMIT', DEFAULT_AUTOCOMPLETE_LIMIT
+    )
+    return get_autocomplete().search(query, limit)
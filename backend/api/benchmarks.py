@@ -0,0 +1,38 @@
+from time import perf_counter
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(func, arguments):
+    """
+    Вызывает func для каждого набора аргументов и возвращает
+    длительности вызовов в миллисекундах.
+    """
+    samples = []
+    for args in arguments:
+        started = perf_counter()
+        func(*args)
+        samples.append((perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'p50': round(percentile(samples, 0.5), 4),
+        'p95': round(percentile(samples, 0.95), 4),
+        'p99': round(percentile(samples, 0.99), 4),
+        'mean': round(sum(samples) / len(samples), 4) if samples else 0.0,
+    }
+
+
+def format_summary(title, samples):
+    stats = summarize(samples)
+    return (f'{title}: p50={stats["p50"]:.3f}ms p95={stats["p95"]:.3f}ms '
+            f'p99={stats["p99"]:.3f}ms (n={stats["count"]})')
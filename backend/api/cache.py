@@ -0,0 +1,102 @@
+from hashlib import md5
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.renderers import JSONRenderer
+
+DEFAULT_REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def version_key(model):
+    return f'reference:{model._meta.label_lower}:version'
+
+
+def get_version(model):
+    """
+    Версия справочника - время последнего изменения в секундах.
+    """
+    key = version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time(), timeout=None)
+        version = cache.get(key, time())
+    return version
+
+
+def bump_version(model):
+    cache.set(version_key(model), time(), timeout=None)
+
+
+class CachedReferenceMixin:
+    """
+    Отдает готовые байты ответа из кэша с ETag и Last-Modified.
+
+    Ключ включает версию справочника cache_model, поэтому изменение
+    модели через сигналы сразу делает старые ответы недоступными.
+    Кэшируется только JSON без параметров типа; остальные форматы
+    (например, browsable API) рендерятся как обычно.
+    """
+    cache_model = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_cache_params(self, request):
+        """
+        Параметры, от которых зависит ответ: аргументы URL и непустые
+        значения известных фильтров в том виде, в каком их применит
+        фильтр. Остальные параметры строки запроса в ключ не попадают.
+        """
+        params = sorted(self.kwargs.items())
+        filterset_class = getattr(self, 'filterset_class', None)
+        if filterset_class is not None:
+            for name in sorted(filterset_class.base_filters):
+                value = request.query_params.get(name, '').strip()
+                if value:
+                    params.append((name, value))
+        return urlencode(params)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (not isinstance(request.accepted_renderer, JSONRenderer)
+                or request.accepted_media_type
+                != request.accepted_renderer.media_type):
+            return handler(request, *args, **kwargs)
+        version = get_version(self.cache_model)
+        key = (f'reference:{self.cache_model._meta.label_lower}:{version}:'
+               f'{self.action}:{self.get_cache_params(request)}')
+        entry = cache.get(key)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                response.add_post_render_callback(
+                    lambda rendered: self.store(key, version, rendered))
+            return response
+        content, content_type, etag = entry
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(version))
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        self.set_validators(response, etag, version)
+        return response
+
+    def store(self, key, version, response):
+        etag = quote_etag(md5(response.content).hexdigest())
+        cache.set(
+            key,
+            (response.content, response['Content-Type'], etag),
+            getattr(settings, 'REFERENCE_CACHE_TIMEOUT',
+                    DEFAULT_REFERENCE_CACHE_TIMEOUT),
+        )
+        self.set_validators(response, etag, version)
+
+    def set_validators(self, response, etag, version):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version)
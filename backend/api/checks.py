@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Сброс кэшей после записи доходит до других воркеров
+    только через общий кэш.
+    """
+    if getattr(settings, 'SHARED_CACHE', False):
+        return []
+    return [Warning(
+        'Кэш по умолчанию не общий для процессов: версии справочников, '
+        'состояние рецептов и журнал what_can_i_cook сбрасываются только '
+        'в воркере, где прошла запись, кэш токенов выключен.',
+        hint='Укажите CACHE_BACKEND и CACHE_LOCATION (Redis, Memcached).',
+        id='api.W001',
+    )]
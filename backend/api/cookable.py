@@ -0,0 +1,229 @@
+from array import array
+from collections import OrderedDict, defaultdict
+from random import randrange
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from recipes.models import IngredInRecipe
+
+DEFAULT_JOURNAL_TIMEOUT = 60 * 60
+MAX_REPLAY = 1000
+MAX_BITSETS = 256
+DENSE_RATIO = 64
+SEQUENCE_KEY = 'cookable:sequence'
+
+
+def entry_key(sequence):
+    return f'cookable:journal:{sequence}'
+
+
+def get_sequence():
+    return cache.get(SEQUENCE_KEY, 0)
+
+
+def record_change(recipe_id):
+    """
+    Кладет id рецепта с измененным составом в общий журнал,
+    чтобы индексы во всех процессах догнали изменение.
+
+    Счетчик начинается со случайного числа: если его вытеснят
+    или сбросят (перезапуск Redis), новые номера не совпадут
+    со старыми, и индексы построятся заново, а не примут чужие
+    записи за продолжение своих.
+    """
+    cache.add(SEQUENCE_KEY, randrange(1 << 62), timeout=None)
+    sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(
+        entry_key(sequence),
+        recipe_id,
+        getattr(settings, 'COOKABLE_JOURNAL_TIMEOUT',
+                DEFAULT_JOURNAL_TIMEOUT),
+    )
+
+
+def to_bitset(positions):
+    """
+    Множество позиций как битовая маска в int: операции над ней
+    выполняются целиком на C.
+    """
+    if not positions:
+        return 0
+    buffer = bytearray((max(positions) >> 3) + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class CookableIndex:
+    """
+    Обратный индекс: ингредиент -> массив позиций рецептов.
+
+    Рецепту выдается постоянная позиция. При запросе списки
+    ингредиентов превращаются в битовые маски, совпадения считаются
+    побитовым сумматором, а рецепты выбираются по маскам
+    "совпало h из s" в порядке убывания доли h / s.
+
+    Маски частых ингредиентов, которые не больше их списков, хранятся
+    постоянно, маски редких - в LRU на MAX_BITSETS штук.
+    """
+    sequence = 0
+
+    def __init__(self, rows):
+        self.recipe_ids = array('q')
+        self.positions = {}
+        self.ingredients = {}
+        self.postings = defaultdict(lambda: array('q'))
+        self.dense_bitsets = {}
+        self.bitsets = OrderedDict()
+        grouped = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            grouped[recipe_id].append(ingredient_id)
+        sizes = defaultdict(list)
+        for recipe_id in sorted(grouped):
+            position = self.add_recipe(recipe_id, grouped[recipe_id])
+            sizes[len(grouped[recipe_id])].append(position)
+        self.size_masks = {
+            size: to_bitset(positions) for size, positions in sizes.items()
+        }
+        for ingredient_id, posting in self.postings.items():
+            if len(posting) * DENSE_RATIO >= len(self.recipe_ids):
+                self.dense_bitsets[ingredient_id] = to_bitset(posting)
+
+    @classmethod
+    def from_database(cls):
+        return cls(IngredInRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id').iterator())
+
+    def add_recipe(self, recipe_id, ingredient_ids):
+        position = self.positions.get(recipe_id)
+        if position is None:
+            position = len(self.recipe_ids)
+            self.positions[recipe_id] = position
+            self.recipe_ids.append(recipe_id)
+        self.ingredients[position] = array('q', ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            self.postings[ingredient_id].append(position)
+        return position
+
+    def toggle(self, position, ingredient_ids):
+        bit = 1 << position
+        for ingredient_id in ingredient_ids:
+            for bitsets in (self.dense_bitsets, self.bitsets):
+                if ingredient_id in bitsets:
+                    bitsets[ingredient_id] ^= bit
+        size = len(ingredient_ids)
+        self.size_masks[size] = self.size_masks.get(size, 0) ^ bit
+
+    def update_recipes(self, recipe_ids):
+        for recipe_id in recipe_ids:
+            position = self.positions.get(recipe_id)
+            ingredient_ids = self.ingredients.pop(position, None)
+            if ingredient_ids is not None:
+                for ingredient_id in ingredient_ids:
+                    self.postings[ingredient_id].remove(position)
+                self.toggle(position, ingredient_ids)
+        grouped = defaultdict(list)
+        rows = IngredInRecipe.objects.filter(
+            recipe_id__in=recipe_ids).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in rows:
+            grouped[recipe_id].append(ingredient_id)
+        for recipe_id, ingredient_ids in grouped.items():
+            self.toggle(
+                self.add_recipe(recipe_id, ingredient_ids), ingredient_ids)
+
+    def bitset(self, ingredient_id):
+        if ingredient_id in self.dense_bitsets:
+            return self.dense_bitsets[ingredient_id]
+        bitsets = self.bitsets
+        if ingredient_id in bitsets:
+            bitsets.move_to_end(ingredient_id)
+        else:
+            bitsets[ingredient_id] = to_bitset(self.postings[ingredient_id])
+            if len(bitsets) > MAX_BITSETS:
+                bitsets.popitem(last=False)
+        return bitsets[ingredient_id]
+
+    def count_hits(self, ingredient_ids):
+        """
+        Маски рецептов по числу совпавших ингредиентов: {h: маска}.
+        """
+        planes, matched = [], 0
+        for ingredient_id in set(ingredient_ids):
+            if not self.postings.get(ingredient_id):
+                continue
+            carry = self.bitset(ingredient_id)
+            matched |= carry
+            for index, plane in enumerate(planes):
+                planes[index], carry = plane ^ carry, plane & carry
+                if not carry:
+                    break
+            if carry:
+                planes.append(carry)
+        by_hits = {}
+        for hits in range(1, 1 << len(planes)):
+            mask = matched
+            for index, plane in enumerate(planes):
+                mask &= plane if hits >> index & 1 else matched ^ plane
+            if mask:
+                by_hits[hits] = mask
+        return by_hits
+
+    def search(self, ingredient_ids, limit):
+        """
+        Рецепты по убыванию доли имеющихся ингредиентов:
+        список (id рецепта, доля, число совпадений).
+        """
+        by_hits = self.count_hits(ingredient_ids)
+        fractions = sorted(
+            ((hits, size) for hits in by_hits for size in self.size_masks
+             if size >= hits),
+            key=lambda fraction: (fraction[0] / fraction[1], fraction[0]),
+            reverse=True,
+        )
+        found = []
+        for hits, size in fractions:
+            mask = by_hits[hits] & self.size_masks[size]
+            while mask and len(found) < limit:
+                position = mask.bit_length() - 1
+                mask ^= 1 << position
+                found.append((self.recipe_ids[position], hits / size, hits))
+            if len(found) >= limit:
+                break
+        return found
+
+
+_index = None
+_lock = Lock()
+
+
+def get_cookable_index():
+    """
+    Индекс строится один раз и догоняет журнал изменений. Если записи
+    журнала истекли, их слишком много или счетчик ушел назад,
+    индекс строится заново. Вызывается под _lock.
+    """
+    global _index
+    sequence = get_sequence()
+    if _index is not None and _index.sequence != sequence:
+        lag = sequence - _index.sequence
+        changes = {}
+        if 0 < lag <= MAX_REPLAY:
+            changes = cache.get_many([
+                entry_key(number)
+                for number in range(_index.sequence + 1, sequence + 1)
+            ])
+        if lag > 0 and len(changes) == lag:
+            _index.update_recipes(set(changes.values()))
+            _index.sequence = sequence
+        else:
+            _index = None
+    if _index is None:
+        _index = CookableIndex.from_database()
+        _index.sequence = sequence
+    return _index
+
+
+def find_cookable(ingredient_ids, limit):
+    with _lock:
+        return get_cookable_index().search(ingredient_ids, limit)
@@ -0,0 +1,67 @@
+import base64
+import binascii
+
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64ImageField
+from recipes.images import (PendingImage, content_name, detect_extension,
+                            is_content_addressed, rendition_name,
+                            verify_image)
+from rest_framework import serializers
+
+
+class DeferredBase64ImageField(Base64ImageField):
+    """
+    Base64-картинка, превью которой нарезаются уже после ответа.
+
+    В запросе base64 декодируется и структура файла проверяется
+    verify(), оригинал сохраняется сразу; пиксели декодируются и превью
+    нарезаются в пуле recipes.images.
+    """
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            if self.required:
+                self.fail('required')
+            return None
+        if not isinstance(data, str):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        if ';base64,' in data:
+            data = data.split(';base64,', 1)[1]
+        try:
+            content = base64.b64decode(''.join(data.split()), validate=True)
+        except (binascii.Error, ValueError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        extension = detect_extension(content[:16])
+        if extension is None:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        try:
+            verify_image(content)
+        except Exception:
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        return PendingImage(content_name(content, extension), content)
+
+
+class ImageRenditionField(serializers.ReadOnlyField):
+    """
+    Ссылка на уменьшенную копию картинки рецепта.
+
+    Пока превью не нарезаны (и для картинок, загруженных до их
+    появления), отдается оригинал.
+    """
+    def __init__(self, rendition, **kwargs):
+        kwargs.setdefault('source', '*')
+        self.rendition = rendition
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        image = recipe.image
+        if not image:
+            return None
+        if is_content_addressed(image.name) and recipe.renditions_ready:
+            url = default_storage.url(rendition_name(image.name,
+                                                     self.rendition))
+        else:
+            url = image.url
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
@@ -1,5 +1,9 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingList, Tag
+from recipes.ranking import order_by_rank
+
+from api.search import search_recipes
 
 
 class IngredFilter(filters.FilterSet):
@@ -11,25 +15,62 @@ class IngredFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
+    """
+    Каждый фильтр сужает входящий queryset полусоединением (EXISTS),
+    поэтому фильтры комбинируются в один запрос без дублей строк
+    и сохраняют prefetch и аннотации вьюсета.
+
+    search сортирует по релевантности, ordering=popular|trending
+    перекрывает этот порядок и сортирует по таблице рейтингов;
+    с ними курсорный режим пагинации не включается.
+    """
     tags = filters.ModelMultipleChoiceFilter(field_name='tags__slug',
                                              to_field_name='slug',
-                                             queryset=Tag.objects.all())
+                                             queryset=Tag.objects.all(),
+                                             method='get_tags')
     is_favorited = filters.BooleanFilter(method='get_favorite',)
     is_in_shopping_cart = filters.BooleanFilter(method='get_shoplist',)
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.ChoiceFilter(
+        choices=(
+            ('popular', 'Популярные'),
+            ('trending', 'Популярные сейчас'),
+        ),
+        method='get_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'author', 'tags', 'is_in_shopping_cart')
+        fields = ('is_favorited', 'author', 'tags', 'is_in_shopping_cart',
+                  'search', 'ordering')
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag_id__in=[tag.pk for tag in value]
+        )))
+
+    def filter_by_user(self, queryset, model, value):
+        if not value:
+            return queryset
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(model.objects.filter(
+            user=user, recipe_id=OuterRef('pk')
+        )))
 
     def get_favorite(self, queryset, name, value):
-        if value:
-            print('test')
-            return Recipe.objects.filter(
-                favorites__user=self.request.user
-            )
-        return Recipe.objects.all()
+        return self.filter_by_user(queryset, Favorite, value)
 
     def get_shoplist(self, queryset, name, value):
-        if value:
-            return Recipe.objects.filter(list__user=self.request.user)
-        return Recipe.objects.all()
+        return self.filter_by_user(queryset, ShoppingList, value)
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        if not value:
+            return queryset
+        return order_by_rank(queryset, value)
@@ -0,0 +1,215 @@
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+PLACEHOLDERS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+METRICS = ('queries', 'db_ms', 'serialize_ms', 'total_ms', 'size')
+
+
+def sql_shape(sql):
+    """
+    Форма запроса: списки IN любой длины сводятся к одному виду.
+    """
+    return PLACEHOLDERS.sub('(...)', sql)
+
+
+class Histogram:
+    """
+    Гистограмма с логарифмическими корзинами: память не растет
+    с числом замеров, погрешность перцентилей - до GROWTH.
+    """
+    GROWTH = 1.1
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        index = -math.inf
+        if value > 0:
+            index = math.ceil(math.log(value, self.GROWTH))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return round(self.GROWTH ** index, 3)
+        return 0.0
+
+    def summary(self):
+        return {
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'mean': round(self.total / self.count, 3) if self.count else 0,
+        }
+
+
+class Registry:
+    """
+    Метрики по эндпоинтам в памяти процесса.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter()
+            self.histograms = defaultdict(
+                lambda: {metric: Histogram() for metric in METRICS})
+            self.n_plus_one = defaultdict(Counter)
+
+    def record(self, endpoint, values, repeated):
+        with self.lock:
+            self.requests[endpoint] += 1
+            histograms = self.histograms[endpoint]
+            for metric, value in values.items():
+                histograms[metric].add(value)
+            self.n_plus_one[endpoint].update(repeated)
+
+    def report(self):
+        with self.lock:
+            return {
+                endpoint: {
+                    'requests': count,
+                    **{metric: histogram.summary() for metric, histogram
+                       in self.histograms[endpoint].items()},
+                    'n_plus_one': [
+                        {'sql': shape, 'requests': times}
+                        for shape, times
+                        in self.n_plus_one[endpoint].most_common(5)
+                    ],
+                }
+                for endpoint, count in sorted(self.requests.items())
+            }
+
+
+registry = Registry()
+
+
+class QueryRecorder:
+    """
+    execute_wrapper: считает запросы, время в БД и формы SQL.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - started
+            self.count += 1
+            self.shapes[sql_shape(sql)] += 1
+
+
+def endpoint_name(view_func):
+    """
+    Имя вьюсета и действия, например RecipeViewSet.list.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    return view_class.__name__
+
+
+class InstrumentationMiddleware:
+    """
+    Считает запросы к БД, время в БД, время рендеринга ответа
+    и его размер по каждому эндпоинту и отдает их в Server-Timing.
+
+    Включается настройкой INSTRUMENTATION. Формы SQL, повторенные
+    за запрос INSTRUMENTATION_N_PLUS_ONE раз и больше, попадают
+    в отчет и лог как возможный N+1.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'INSTRUMENTATION_N_PLUS_ONE',
+                                 DEFAULT_N_PLUS_ONE_THRESHOLD)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._instrumentation = {'endpoint': 'unresolved',
+                                    'serialize': 0.0}
+        started = perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total = perf_counter() - started
+        metrics = request._instrumentation
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={recorder.duration * 1000:.1f};'
+            f'desc="{recorder.count} queries"',
+            f'serialize;dur={metrics["serialize"] * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, recorder, metrics, total)
+        else:
+            self.record(recorder, metrics, total, len(response.content))
+        return response
+
+    def stream(self, chunks, recorder, metrics, total):
+        size = 0
+        started = perf_counter()
+        with connection.execute_wrapper(recorder):
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        metrics['serialize'] += perf_counter() - started
+        self.record(recorder, metrics, total + perf_counter() - started,
+                    size)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = endpoint_name(view_func)
+        actions = getattr(view_func, 'actions', None)
+        if actions:
+            name = f'{name}.{actions.get(request.method.lower(), "-")}'
+        request._instrumentation['endpoint'] = name
+
+    def process_template_response(self, request, response):
+        started = perf_counter()
+
+        def rendered(response):
+            request._instrumentation['serialize'] += perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, recorder, metrics, total, size):
+        repeated = [shape for shape, times in recorder.shapes.items()
+                    if times >= self.threshold]
+        for shape in repeated:
+            logger.warning('Возможный N+1 в %s: %s раз %s',
+                           metrics['endpoint'], recorder.shapes[shape], shape)
+        registry.record(metrics['endpoint'], {
+            'queries': recorder.count,
+            'db_ms': recorder.duration * 1000,
+            'serialize_ms': metrics['serialize'] * 1000,
+            'total_ms': total * 1000,
+            'size': size,
+        }, repeated)
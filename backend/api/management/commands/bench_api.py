@@ -0,0 +1,161 @@
+import json
+import platform
+import tracemalloc
+from time import perf_counter
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.dataset import DatasetGenerator
+from recipes.models import (Favorite, Ingredient, IngredInRecipe, Recipe,
+                            ShoppingList, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow
+
+from api.benchmarks import summarize
+
+
+def consume(response):
+    if response.streaming:
+        return len(b''.join(response.streaming_content))
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет основные эндпоинты API через тестовый клиент '
+            'и пишет JSON с задержками, числом запросов и пиком памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=0,
+            help='Сгенерировать столько рецептов перед замером; '
+                 '0 - взять текущие данные.')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', nargs='*',
+                            help='Имена сценариев для прогона.')
+        parser.add_argument('--output', help='Файл для JSON-отчета.')
+
+    def handle(self, *args, **options):
+        if options['recipes']:
+            DatasetGenerator(
+                users=options['users'],
+                recipes=options['recipes'],
+                log=self.stderr.write,
+            ).generate()
+        scenarios = self.scenarios()
+        if options['only']:
+            unknown = set(options['only']) - set(scenarios)
+            if unknown:
+                raise CommandError(f'Нет сценариев: {sorted(unknown)}')
+            scenarios = {name: scenarios[name] for name in options['only']}
+        results = {}
+        for name, requests in scenarios.items():
+            results[name] = self.run(requests, options)
+            self.stderr.write(
+                f'{name}: p50={results[name]["latency_ms"]["p50"]}ms '
+                f'queries={results[name]["queries"]} '
+                f'status={results[name]["status"]}')
+        report = json.dumps({
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                model._meta.label: model.objects.count()
+                for model in (Recipe, IngredInRecipe, Favorite,
+                              ShoppingList, Follow, Tag, Ingredient)
+            },
+            'iterations': options['iterations'],
+            'scenarios': results,
+        }, ensure_ascii=False, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def scenarios(self):
+        favorite = Favorite.objects.select_related('user').last()
+        if favorite is None:
+            raise CommandError('Нет данных: запустите с --recipes.')
+        user = favorite.user
+        token, _ = Token.objects.get_or_create(user=user)
+        auth = APIClient()
+        auth.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        anon = APIClient()
+        recipe = Recipe.objects.order_by('-pk').first()
+        tag = Tag.objects.order_by('pk').first()
+        ingredients = ','.join(str(pk) for pk in (
+            IngredInRecipe.objects.filter(recipe=recipe)
+            .values_list('ingredient_id', flat=True)
+        ))
+        word = recipe.name.split()[0]
+
+        def get(client, url):
+            return ((client.get, url),)
+
+        return {
+            'recipes_list_anonymous': get(anon, '/api/recipes/'),
+            'recipes_list': get(auth, '/api/recipes/?limit=20'),
+            'recipes_list_cursor': get(
+                auth, '/api/recipes/?pagination=cursor&limit=20'),
+            'recipes_filtered': get(
+                auth, f'/api/recipes/?tags={tag.slug}&is_favorited=1'),
+            'recipes_search': get(
+                auth, f'/api/recipes/?search={word}'),
+            'recipes_popular': get(
+                auth, '/api/recipes/?ordering=popular'),
+            'recipe_detail': get(auth, f'/api/recipes/{recipe.pk}/'),
+            'what_can_i_cook': get(
+                auth,
+                f'/api/recipes/what_can_i_cook/?ingredients={ingredients}'),
+            'download_shopping_cart': get(
+                auth, '/api/recipes/download_shopping_cart/'),
+            'favorite_toggle': (
+                (auth.delete, f'/api/recipes/{favorite.recipe_id}/favorite/'),
+                (auth.post, f'/api/recipes/{favorite.recipe_id}/favorite/'),
+            ),
+            'subscriptions': get(
+                auth, '/api/users/subscriptions/?recipes_limit=3'),
+            'users_list': get(auth, '/api/users/'),
+            'users_me': get(auth, '/api/users/me/'),
+            'tags': get(anon, '/api/tags/'),
+            'ingredients_search': get(
+                anon, '/api/ingredients/?name=са'),
+        }
+
+    def call(self, requests):
+        size, statuses = 0, []
+        for method, url in requests:
+            response = method(url)
+            size += consume(response)
+            statuses.append(response.status_code)
+        return size, statuses
+
+    def run(self, requests, options):
+        for _ in range(options['warmup']):
+            self.call(requests)
+        with CaptureQueriesContext(connection) as queries:
+            size, statuses = self.call(requests)
+        query_count = len(queries.captured_queries)
+        tracemalloc.start()
+        self.call(requests)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        samples = []
+        for _ in range(options['iterations']):
+            started = perf_counter()
+            self.call(requests)
+            samples.append((perf_counter() - started) * 1000)
+        return {
+            'latency_ms': summarize(samples),
+            'queries': query_count,
+            'peak_memory_kb': round(peak / 1024, 1),
+            'response_bytes': size,
+            'status': statuses,
+        }
@@ -0,0 +1,42 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Ingredient
+
+from api.autocomplete import IngredientAutocomplete, autocomplete_ingredients
+from api.benchmarks import format_summary, measure
+from api.filters import IngredFilter
+from api.serializers import IngredientSerializer
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку фильтра IngredFilter и автодополнения '
+            'ингредиентов из памяти.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError('Справочник ингредиентов пуст.')
+        rng = random.Random(options['seed'])
+        queries = []
+        for _ in range(options['iterations']):
+            name = rng.choice(names)
+            queries.append((name[:rng.randint(1, min(5, len(name)))],))
+
+        def current_filter(query):
+            queryset = IngredFilter(
+                {'name': query}, queryset=Ingredient.objects.all()).qs
+            return IngredientSerializer(queryset, many=True).data
+
+        autocomplete_ingredients('')
+        self.stdout.write(format_summary(
+            'IngredFilter', measure(current_filter, queries)))
+        self.stdout.write(format_summary(
+            'autocomplete', measure(autocomplete_ingredients, queries)))
+        self.stdout.write(format_summary(
+            'autocomplete (загрузка снимка)',
+            measure(IngredientAutocomplete.from_database, [()] * 5)))
@@ -0,0 +1,91 @@
+import json
+from io import BytesIO
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Favorite
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.benchmarks import measure, summarize
+from api.parsers import FastJSONParser, orjson
+from api.renderers import FastJSONRenderer
+
+URLS = (
+    '/api/recipes/?limit=100',
+    '/api/recipes/?limit=6',
+    '/api/users/subscriptions/?limit=20',
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/users/?limit=100',
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стандартные JSONRenderer/JSONParser '
+            'с FastJSONRenderer/FastJSONParser на записанных ответах API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='JSON-файлы с записанными ответами; без них ответы '
+                 'снимаются с API тестовым клиентом.')
+        parser.add_argument('--save', help='Каталог для записи ответов.')
+        parser.add_argument('--iterations', type=int, default=30)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write('orjson не установлен: сравнение с собой же.')
+        if options['files']:
+            responses = {
+                Path(name).name: json.loads(Path(name).read_bytes())
+                for name in options['files']
+            }
+        else:
+            responses = self.record()
+        if options['save']:
+            directory = Path(options['save'])
+            directory.mkdir(parents=True, exist_ok=True)
+            for number, data in enumerate(responses.values()):
+                (directory / f'response_{number}.json').write_bytes(
+                    JSONRenderer().render(data))
+        arguments = [()] * options['iterations']
+        for name, data in responses.items():
+            content = JSONRenderer().render(data)
+            renders = [
+                summarize(measure(lambda: renderer.render(data), arguments))
+                for renderer in (JSONRenderer(), FastJSONRenderer())
+            ]
+            parses = [
+                summarize(measure(
+                    lambda: parser.parse(BytesIO(content)), arguments))
+                for parser in (JSONParser(), FastJSONParser())
+            ]
+            identical = (
+                FastJSONRenderer().render(data) == content
+                and FastJSONParser().parse(BytesIO(content))
+                == JSONParser().parse(BytesIO(content))
+            )
+            self.stdout.write(
+                f'{name} ({len(content) // 1024} КБ): '
+                f'рендер {renders[0]["p50"]:.3f} -> '
+                f'{renders[1]["p50"]:.3f}ms, '
+                f'разбор {parses[0]["p50"]:.3f} -> {parses[1]["p50"]:.3f}ms, '
+                f'результат {"совпадает" if identical else "ОТЛИЧАЕТСЯ"}')
+
+    def record(self):
+        favorite = Favorite.objects.select_related('user').last()
+        if favorite is None:
+            raise CommandError('Нет данных: запустите generate_dataset.')
+        token, _ = Token.objects.get_or_create(user=favorite.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        responses = {}
+        for url in URLS:
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: статус {response.status_code}')
+            responses[url] = response.data
+        return responses
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.dataset import DatasetGenerator
+from recipes.models import Favorite, Tag
+from rest_framework.test import APIClient
+
+from api.benchmarks import format_summary, measure
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время и число запросов списка рецептов '
+            'с комбинациями фильтров RecipeFilter.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=0,
+            help='Сгенерировать столько рецептов перед замером '
+                 '(в текущей БД); 0 - взять текущие данные.')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=6)
+
+    def handle(self, *args, **options):
+        if options['recipes']:
+            summary = DatasetGenerator(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients_per_recipe=(1, 3),
+                favorites_per_user=50,
+                cart_per_user=10,
+                log=self.stdout.write,
+            ).generate()
+            self.stdout.write(f'Сгенерировано: {summary}')
+        favorite = Favorite.objects.select_related('user').last()
+        if favorite is None:
+            raise CommandError('Нет данных: запустите с --recipes.')
+        user = favorite.user
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        if not slugs:
+            raise CommandError('Нет тегов для фильтрации.')
+        tags = '&'.join(f'tags={slug}' for slug in slugs)
+        cases = {
+            'без фильтров': '',
+            'один тег': f'tags={slugs[0]}',
+            'несколько тегов': tags,
+            'автор': f'author={user.pk}',
+            'избранное': 'is_favorited=1',
+            'корзина': 'is_in_shopping_cart=1',
+            'избранное + теги': f'is_favorited=1&{tags}',
+            'автор + теги': f'author={user.pk}&{tags}',
+        }
+        client = APIClient()
+        client.force_authenticate(user)
+        for title, query in cases.items():
+            url = f'/api/recipes/?limit={options["limit"]}&{query}'
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: {response.status_code}')
+            query_count = len(queries.captured_queries)
+            samples = measure(client.get, [(url,)] * options['iterations'])
+            self.stdout.write(
+                f'{format_summary(title, samples)} '
+                f'queries={query_count} '
+                f'count={response.data["count"]}'
+            )
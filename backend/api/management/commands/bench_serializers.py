@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Favorite, Ingredient, Tag
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import measure, summarize
+from api.recipe_state import get_recipe_state
+from api.representations import (FastFollowSerializer,
+                                 FastIngredientSerializer,
+                                 FastRecipeSerializer, FastTagSerializer)
+from api.serializers import (FollowSerializer, GetRecipeSerializer,
+                             IngredientSerializer, TagSerializer)
+from api.views import RecipeViewSet, UsersViewSet
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает сериализаторы DRF с быстрыми представлениями '
+            'из api.representations: время на объект и совпадение JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100,
+                            help='Объектов в одной "странице".')
+        parser.add_argument('--iterations', type=int, default=30)
+
+    def handle(self, *args, **options):
+        favorite = Favorite.objects.select_related('user').last()
+        if favorite is None:
+            raise CommandError('Нет данных: запустите generate_dataset.')
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = favorite.user
+        items = options['items']
+        recipes = RecipeViewSet(request=request).get_queryset()[:items]
+        users = UsersViewSet(request=request)
+        follows = users.attach_feed_recipes(
+            users.get_subscriptions_queryset()[:items])
+        context = {'request': request,
+                   'recipe_state': get_recipe_state(request)}
+        cases = (
+            ('recipes', GetRecipeSerializer, FastRecipeSerializer,
+             list(recipes)),
+            ('subscriptions', FollowSerializer, FastFollowSerializer,
+             list(follows)),
+            ('tags', TagSerializer, FastTagSerializer,
+             list(Tag.objects.all())),
+            ('ingredients', IngredientSerializer, FastIngredientSerializer,
+             list(Ingredient.objects.all()[:items])),
+        )
+        renderer = JSONRenderer()
+        for name, reference, fast, objects in cases:
+            if not objects:
+                self.stdout.write(f'{name}: нет данных')
+                continue
+
+            def render(serializer_class):
+                return renderer.render(serializer_class(
+                    objects, many=True, context=context).data)
+
+            identical = render(reference) == render(fast)
+            arguments = [()] * options['iterations']
+            timings = [
+                summarize(measure(lambda: render(serializer), arguments))
+                for serializer in (reference, fast)
+            ]
+            per_item = [
+                timing['p50'] * 1000 / len(objects) for timing in timings
+            ]
+            self.stdout.write(
+                f'{name} ({len(objects)} шт.): DRF {per_item[0]:.1f} мкс, '
+                f'быстрый {per_item[1]:.1f} мкс на объект, '
+                f'ускорение x{per_item[0] / per_item[1]:.1f}, '
+                f'JSON {"совпадает" if identical else "ОТЛИЧАЕТСЯ"}')
@@ -0,0 +1,48 @@
+import random
+
+from django.core.management.base import BaseCommand
+from recipes.units import TO_TASTE, UNITS, merge_units
+
+from api.benchmarks import format_summary, measure
+from api.renderers import TextShoppingCartRenderer
+
+
+class Command(BaseCommand):
+    help = ('Замеряет объединение единиц и выгрузку списка покупок '
+            'на синтетической корзине.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        units = list(UNITS) + [TO_TASTE, 'шт.']
+        rows = sorted(
+            (
+                {'name': f'ингредиент {rng.randint(1, options["lines"] // 2)}',
+                 'measurement_unit': rng.choice(units),
+                 'total': rng.randint(1, 1000)}
+                for _ in range(options['lines'])
+            ),
+            key=lambda row: (row['name'], row['measurement_unit']),
+        )
+        renderer = TextShoppingCartRenderer()
+
+        def merge():
+            return list(merge_units(rows))
+
+        def export(stage):
+            return ''.join(renderer.stream(stage(rows)))
+
+        arguments = [()] * options['iterations']
+        merged = merge()
+        self.stdout.write(
+            f'Строк: {len(rows)}, после объединения: {len(merged)}')
+        self.stdout.write(format_summary('merge_units', measure(
+            merge, arguments)))
+        self.stdout.write(format_summary('выгрузка без объединения', measure(
+            export, [(iter,)] * options['iterations'])))
+        self.stdout.write(format_summary('выгрузка с объединением', measure(
+            export, [(merge_units,)] * options['iterations'])))
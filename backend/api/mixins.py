@@ -1,11 +1,14 @@
-from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from recipes.models import Recipe
+from recipes.cart import change_cart
+from recipes.counters import COUNTERS, change_counter, lock_recipes
+from recipes.models import ShoppingList
 from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-User = get_user_model()
+from api.recipe_state import invalidate_recipe_state
+from api.serializers import BulkRecipesSerializer
 
 
 class CustomViewSet(mixins.RetrieveModelMixin,
@@ -21,19 +24,115 @@ class CustomMethodViewSet:
     """
     Кастомные методы для вьюсетов.
     """
-    def post_delete_method(self, model, serializer, pk, filter):
+    def post_delete_method(self, model, serializer, queryset, pk):
+        """
+        POST связывает пользователя с объектом pk из queryset
+        (рецептом или автором), DELETE удаляет связь.
+
+        Повтор ловится уникальным ограничением таблицы при вставке
+        и числом удаленных строк при удалении, поэтому отдельной
+        проверки exists() нет и двойной клик не проходит даже
+        при параллельных запросах.
+
+        Объект блокируется первым (см. lock_recipes): SELECT FOR UPDATE
+        при вставке, UPDATE счетчика при удалении. Пользователя
+        блокирует только пересчет корзины.
+        """
         user = self.request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        author = get_object_or_404(User, id=pk)
-        data = {"recipe": recipe.pk,
-                "author": author.pk,
-                "user": user.pk}
-        serializer = serializer(data=data,
-                                context={'request': self.request})
-        serializer.is_valid(raise_exception=True)
-        if self.request.method == 'POST':
-            serializer.save(user=user)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        elif self.request.method == 'DELETE':
-            model.objects.filter(filter & Q(user=user)).delete()
+        field = COUNTERS[model][1]
+        errors = serializer.toggle_errors[self.request.method]
+        if self.request.method == 'DELETE':
+            with transaction.atomic():
+                change_counter(model, (pk,), -1)
+                deleted, _ = model.objects.filter(
+                    user=user, **{f'{field}_id': pk}).delete()
+                if not deleted:
+                    transaction.set_rollback(True)
+                elif model is ShoppingList:
+                    change_cart(user.pk, (pk,), -1)
+            if not deleted:
+                get_object_or_404(queryset, pk=pk)
+                raise ValidationError(errors)
+            invalidate_recipe_state(model, user.pk)
             return Response({'Message:': 'Объект удален'})
+        try:
+            with transaction.atomic():
+                target = get_object_or_404(queryset.select_for_update(),
+                                           pk=pk)
+                instance = model(user=user, **{field: target})
+                instance.save(force_insert=True)
+                change_counter(model, (target.pk,), 1)
+                if model is ShoppingList:
+                    change_cart(user.pk, (target.pk,), 1)
+        except IntegrityError:
+            raise ValidationError(errors)
+        invalidate_recipe_state(model, user.pk)
+        serializer = serializer(instance, context={'request': self.request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def bulk_method(self, model):
+        """
+        POST добавляет, DELETE убирает рецепты из списка recipes
+        одним атомарным запросом и возвращает статус по каждому id.
+        """
+        serializer = BulkRecipesSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if self.request.method == 'DELETE':
+            removed = self.remove_recipes(model, recipe_ids)
+            statuses = {recipe_id: 'removed' for recipe_id in removed}
+            default = 'missing'
+        else:
+            added, statuses = self.add_recipes(model, recipe_ids)
+            statuses.update((recipe_id, 'added') for recipe_id in added)
+            default = 'not_found'
+        return Response({'results': [
+            {'id': recipe_id, 'status': statuses.get(recipe_id, default)}
+            for recipe_id in recipe_ids
+        ]})
+
+    def add_recipes(self, model, recipe_ids):
+        """
+        Рецепты блокируются на всю транзакцию: все, кто добавляет их
+        в списки, ждут этой блокировки, поэтому список present
+        не устаревает до вставки, а счетчики и корзина сдвигаются ровно
+        на вставленные рецепты по их текущему составу.
+        """
+        user = self.request.user
+        with transaction.atomic():
+            found = set(lock_recipes(recipe_ids))
+            present = set(model.objects.filter(
+                user=user, recipe_id__in=found
+            ).values_list('recipe_id', flat=True))
+            added = [recipe_id for recipe_id in recipe_ids
+                     if recipe_id in found and recipe_id not in present]
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=recipe_id)
+                 for recipe_id in added])
+            change_counter(model, added, 1)
+            if model is ShoppingList:
+                change_cart(user.pk, added, 1)
+        invalidate_recipe_state(model, user.pk)
+        return added, {recipe_id: 'exists' for recipe_id in present}
+
+    def remove_recipes(self, model, recipe_ids=None):
+        """
+        Удаляет рецепты recipe_ids (или все) одним DELETE. Рецепты
+        блокируются до удаления, чтобы счетчики и итоги корзины
+        сдвинулись ровно на удаленные.
+        """
+        user = self.request.user
+        queryset = model.objects.filter(user=user)
+        if recipe_ids is not None:
+            queryset = queryset.filter(recipe_id__in=recipe_ids)
+        with transaction.atomic():
+            lock_recipes(list(queryset.values_list('recipe_id', flat=True)))
+            rows = dict(queryset.values_list(
+                'pk', 'recipe_id'))
+            model.objects.filter(pk__in=rows).delete()
+            change_counter(model, rows.values(), -1)
+            if model is ShoppingList:
+                change_cart(user.pk, list(rows.values()), -1)
+        removed = list(rows.values())
+        invalidate_recipe_state(model, user.pk)
+        return removed
@@ -1,5 +1,167 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+
+RECIPES_LIMIT_PARAM = 'recipes_limit'
 
 
 class LimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class LimitCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация без OFFSET и COUNT(*).
+
+    Курсор хранит значения всех полей порядка крайней строки страницы,
+    и следующая страница выбирается сравнением по этому ключу, поэтому
+    строки с одинаковым pub_date не теряются и не повторяются.
+    Порядок берется из view.get_cursor_ordering(), по умолчанию
+    по ключу (pub_date, id) от новых к старым.
+    """
+    page_size_query_param = 'limit'
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, 'get_cursor_ordering'):
+            return tuple(view.get_cursor_ordering())
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                name[1:] if name.startswith('-') else '-' + name
+                for name in ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(
+                queryset.model, self.cursor.position, reverse))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_fields(self, model):
+        return [
+            model._meta.get_field(name.lstrip('-')) for name in self.ordering
+        ]
+
+    def get_keyset_filter(self, model, position, reverse):
+        """
+        Условие "строго после ключа" в порядке self.ordering.
+
+        Первое поле дополнительно ограничено нестрогим сравнением,
+        чтобы индекс по ключу читался диапазоном.
+        """
+        fields = self.get_fields(model)
+        try:
+            values = json.loads(position)
+            if len(values) != len(fields):
+                raise ValueError
+            values = [
+                field.to_python(value) for field, value in zip(fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        keyset = Q()
+        equal = {}
+        lookups = []
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') != reverse else 'gt'
+            lookups.append(lookup)
+            keyset |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        first = self.ordering[0].lstrip('-')
+        return Q(**{f'{first}__{lookups[0]}e': values[0]}) & keyset
+
+    def get_position(self, instance):
+        return json.dumps([
+            field.value_to_string(instance)
+            for field in self.get_fields(type(instance))
+        ])
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False, position=self.get_position(self.page[-1])
+        ))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True, position=self.get_position(self.page[0])
+        ))
+
+
+class FeedPagination(LimitPagination):
+    """
+    Постраничная пагинация с опциональным курсорным режимом.
+
+    Курсорный режим включается параметром pagination=cursor; ответ
+    тогда не содержит count, а ссылки next/previous несут курсор.
+    Если queryset уже отсортирован иначе, чем ключ курсора (поиск,
+    ordering=popular|trending), остается постраничный режим.
+    """
+    mode_query_param = 'pagination'
+    cursor_pagination_class = LimitCursorPagination
+    cursor_paginator = None
+
+    def get_cursor_paginator(self, queryset, request, view):
+        if (request.query_params.get(self.mode_query_param) != 'cursor'
+                and self.cursor_pagination_class.cursor_query_param
+                not in request.query_params):
+            return None
+        paginator = self.cursor_pagination_class()
+        order_by = tuple(queryset.query.order_by)
+        if order_by and order_by != tuple(
+                paginator.get_ordering(request, queryset, view)):
+            return None
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = self.get_cursor_paginator(
+            queryset, request, view)
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+def get_recipes_limit(request):
+    """
+    Лимит рецептов автора в ленте подписок из параметра recipes_limit.
+    """
+    if request is None:
+        return None
+    try:
+        limit = int(request.query_params[RECIPES_LIMIT_PARAM])
+    except (KeyError, ValueError):
+        return None
+    return limit if limit >= 0 else None
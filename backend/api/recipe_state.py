@@ -0,0 +1,87 @@
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from recipes.models import Favorite, ShoppingList
+
+DEFAULT_RECIPE_STATE_TIMEOUT = 60 * 5
+STATE_FIELDS = {
+    Favorite: 'favorites',
+    ShoppingList: 'shopping_cart',
+}
+
+
+class RecipeState:
+    """
+    Множества id рецептов в избранном и в корзине пользователя.
+    """
+    def __init__(self, favorites, shopping_cart):
+        self.favorites = favorites
+        self.shopping_cart = shopping_cart
+
+    @classmethod
+    def from_database(cls, user_id):
+        return cls(**{
+            field: set(model.objects.filter(user_id=user_id)
+                       .values_list('recipe_id', flat=True))
+            for model, field in STATE_FIELDS.items()
+        })
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in STATE_FIELDS.values()}
+
+
+def version_key(user_id):
+    return f'recipe_state_version:{user_id}'
+
+
+def state_key(user_id, version):
+    return f'recipe_state:{user_id}:{version}'
+
+
+def get_timeout():
+    return getattr(settings, 'RECIPE_STATE_TIMEOUT',
+                   DEFAULT_RECIPE_STATE_TIMEOUT)
+
+
+def get_state_version(user_id):
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_recipe_state(request):
+    """
+    Состояние читается один раз за запрос: из кэша, а при промахе
+    двумя запросами к БД.
+
+    Ключ включает версию пользователя, которую меняет каждая запись,
+    поэтому устаревшее значение, положенное медленным читателем
+    после записи, уже никто не прочитает.
+    """
+    state = getattr(request, '_recipe_state', None)
+    if state is None:
+        user_id = request.user.pk
+        key = state_key(user_id, get_state_version(user_id))
+        data = cache.get(key)
+        if data is None:
+            state = RecipeState.from_database(user_id)
+            cache.add(key, state.as_dict(), get_timeout())
+        else:
+            state = RecipeState(**data)
+        request._recipe_state = state
+    return state
+
+
+def invalidate_recipe_state(model, user_id):
+    """
+    Сбрасывает закэшированное состояние после коммита записи в model.
+    """
+    if model not in STATE_FIELDS:
+        return
+    transaction.on_commit(
+        lambda: cache.set(version_key(user_id), uuid4().hex, timeout=None))
@@ -0,0 +1,163 @@
+import csv
+import os
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+try:
+    import orjson
+    JSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+except ImportError:
+    orjson = None
+
+SHOPPING_CART_TITLE = 'Список покупок:'
+JS_SEPARATORS = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson, если он установлен, иначе стандартный.
+
+    ReturnDict и ReturnList уходят в orjson как есть, строки пишутся
+    в UTF-8 без экранирования. Типы, которых orjson не знает,
+    и даты отдаются кодировщику DRF, а U+2028/U+2029 экранируются,
+    как в JSONRenderer, поэтому ответ совпадает с ним побайтно.
+    Отступы, ASCII-режим и то, что orjson не смог закодировать,
+    обрабатывает стандартный рендерер.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {})):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        try:
+            content = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=JSON_OPTIONS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        for separator, escaped in JS_SEPARATORS:
+            if separator in content:
+                content = content.replace(separator, escaped)
+        return content
+
+
+class Echo:
+    """
+    Буфер-заглушка для csv.writer: возвращает записанную строку.
+    """
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+
+    Метод stream отдает файл по частям из итератора строк вида
+    {'name': ..., 'measurement_unit': ..., 'total': ...}, поэтому
+    список любой длины не собирается в памяти целиком. По умолчанию
+    это текст: заголовок и по строке на ингредиент; другие форматы
+    переопределяют stream.
+    """
+    charset = 'utf-8'
+    filename = 'shopping_list'
+
+    def format_row(self, row):
+        return f'{row["name"]}: {row["total"]} {row["measurement_unit"]}'
+
+    def stream(self, rows):
+        yield f'{SHOPPING_CART_TITLE}\n\n'
+        separator = ''
+        for row in rows:
+            yield f'{separator}{self.format_row(row)}'
+            separator = '\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data)
+
+    def get_filename(self):
+        return f'{self.filename}.{self.format}'
+
+
+class TextShoppingCartRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVShoppingCartRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('Ингредиент', 'Количество', 'Ед. измерения'))
+        for row in rows:
+            yield writer.writerow(
+                (row['name'], row['total'], row['measurement_unit'])
+            )
+
+
+class PDFShoppingCartRenderer(ShoppingCartRenderer):
+    """
+    PDF собирается целиком в буфере: формат не допускает потоковой
+    записи. Встроенные шрифты PDF не знают кириллицы, поэтому текст
+    пишется TTF-шрифтом из SHOPPING_CART_PDF_FONT.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_size = 12
+    margin = 40
+
+    def get_font(self):
+        if 'ShoppingCartFont' not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(
+                'ShoppingCartFont', settings.SHOPPING_CART_PDF_FONT))
+        return 'ShoppingCartFont'
+
+    def stream(self, rows):
+        buffer = BytesIO()
+        font = self.get_font()
+        width, height = A4
+        page = canvas.Canvas(buffer, pagesize=A4)
+        page.setFont(font, self.font_size)
+        y = height - self.margin
+        page.drawString(self.margin, y, SHOPPING_CART_TITLE)
+        for row in rows:
+            y -= self.font_size * 1.5
+            if y < self.margin:
+                page.showPage()
+                page.setFont(font, self.font_size)
+                y = height - self.margin
+            page.drawString(self.margin, y, self.format_row(row))
+        page.save()
+        yield buffer.getvalue()
+
+
+SHOPPING_CART_RENDERERS = [
+    TextShoppingCartRenderer,
+    CSVShoppingCartRenderer,
+]
+if canvas is not None and os.path.isfile(
+        getattr(settings, 'SHOPPING_CART_PDF_FONT', None) or ''):
+    SHOPPING_CART_RENDERERS.append(PDFShoppingCartRenderer)
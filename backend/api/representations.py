@@ -0,0 +1,201 @@
+from operator import attrgetter
+
+from django.core.files.storage import default_storage
+from django.utils.encoding import iri_to_uri
+from django.utils.functional import cached_property
+from recipes.images import is_content_addressed, rendition_name
+from recipes.models import Favorite, ShoppingList
+from rest_framework import serializers
+
+from api.paginations import get_recipes_limit
+
+
+class PlainSerializer(serializers.BaseSerializer):
+    """
+    Read-only сериализатор без полей DRF: словарь собирается
+    по fields через attrgetter, построенные один раз на класс.
+
+    Ключи, их порядок и значения совпадают с ModelSerializer,
+    который он заменяет, поэтому JSON ответа не меняется.
+    """
+    fields = ()
+    sources = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.getters = tuple(
+            (name, attrgetter(cls.sources.get(name, name)))
+            for name in cls.fields
+        )
+
+    def to_representation(self, instance):
+        return {name: getter(instance) for name, getter in self.getters}
+
+    @cached_property
+    def request(self):
+        return self.context.get('request')
+
+    @cached_property
+    def host(self):
+        return self.request.build_absolute_uri('/')[:-1]
+
+    def absolute_url(self, url):
+        """
+        То же, что request.build_absolute_uri(url), но для путей
+        от корня сайта без разбора URL на каждый вызов.
+        """
+        if self.request is None:
+            return url
+        if (url.startswith('/') and not url.startswith('//')
+                and '/./' not in url and '/../' not in url):
+            return iri_to_uri(self.host + url)
+        return self.request.build_absolute_uri(url)
+
+    def image_url(self, image):
+        if not image:
+            return None
+        return self.absolute_url(image.url)
+
+    def rendition_url(self, recipe, rendition):
+        image = recipe.image
+        if not image:
+            return None
+        if not (is_content_addressed(image.name)
+                and recipe.renditions_ready):
+            return self.absolute_url(image.url)
+        return self.absolute_url(
+            default_storage.url(rendition_name(image.name, rendition)))
+
+
+class FastTagSerializer(PlainSerializer):
+    fields = ('id', 'name', 'color', 'slug')
+
+
+class FastIngredientSerializer(PlainSerializer):
+    fields = ('id', 'name', 'measurement_unit')
+
+
+class FastIngredInRecipeSerializer(PlainSerializer):
+    def to_representation(self, row):
+        ingredient = row.ingredient
+        return {
+            'id': row.ingredient_id,
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+            'amount': row.amount,
+        }
+
+
+class FastShortRecipeSerializer(PlainSerializer):
+    def to_representation(self, recipe):
+        image = recipe.image
+        return {
+            'id': recipe.id,
+            'name': recipe.name,
+            'image': self.image_url(image),
+            'image_thumbnail': self.rendition_url(recipe, 'thumbnail'),
+            'cooking_time': recipe.cooking_time,
+        }
+
+
+class FastAuthorSerializer(PlainSerializer):
+    fields = ('email', 'id', 'username', 'first_name', 'last_name')
+
+    def to_representation(self, user):
+        data = super().to_representation(user)
+        data['is_subscribed'] = self.is_subscribed(user)
+        return data
+
+    def is_subscribed(self, user):
+        if self.request is None or self.request.user.is_anonymous:
+            return False
+        if hasattr(user, 'is_subscribed'):
+            return user.is_subscribed
+        return user.subscribed_by.filter(user=self.request.user).exists()
+
+
+class FastRecipeSerializer(PlainSerializer):
+    """
+    Представление рецепта для чтения, совпадает с GetRecipeSerializer.
+    Ждет queryset из RecipeViewSet.get_queryset с prefetch автора,
+    тегов и ингредиентов.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.author = FastAuthorSerializer(context=self.context)
+        self.tag = FastTagSerializer()
+        self.ingredient = FastIngredInRecipeSerializer()
+
+    @cached_property
+    def state(self):
+        if self.request is None or self.request.user.is_anonymous:
+            return None
+        return self.context.get('recipe_state')
+
+    def is_marked(self, recipe, field, annotation, model):
+        if self.request is None or self.request.user.is_anonymous:
+            return False
+        if self.state is not None:
+            return recipe.pk in getattr(self.state, field)
+        if hasattr(recipe, annotation):
+            return getattr(recipe, annotation)
+        return model.objects.filter(
+            user=self.request.user, recipe=recipe).exists()
+
+    def to_representation(self, recipe):
+        image = recipe.image
+        tag = self.tag.to_representation
+        ingredient = self.ingredient.to_representation
+        return {
+            'id': recipe.id,
+            'author': self.author.to_representation(recipe.author),
+            'name': recipe.name,
+            'image': self.image_url(image),
+            'image_card': self.rendition_url(recipe, 'card'),
+            'image_thumbnail': self.rendition_url(recipe, 'thumbnail'),
+            'text': recipe.text,
+            'ingredients': [
+                ingredient(row) for row in recipe.ingredinrecipe_set.all()
+            ],
+            'tags': [tag(item) for item in recipe.tags.all()],
+            'cooking_time': recipe.cooking_time,
+            'is_favorited': self.is_marked(
+                recipe, 'favorites', 'is_favorited', Favorite),
+            'is_in_shopping_cart': self.is_marked(
+                recipe, 'shopping_cart', 'is_in_shopping_cart',
+                ShoppingList),
+        }
+
+
+class FastFollowSerializer(PlainSerializer):
+    """
+    Подписка в ленте, совпадает с FollowSerializer. Рецепты автора,
+    как и там, отдаются с относительными ссылками на картинки.
+    """
+    fields = ('email', 'id', 'username', 'first_name', 'last_name')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recipe = FastShortRecipeSerializer()
+
+    def to_representation(self, follow):
+        author = follow.author
+        data = super().to_representation(author)
+        data['is_subscribed'] = self.is_subscribed(follow)
+        recipes = getattr(author, 'feed_recipes', None)
+        if recipes is None:
+            recipes = author.recipes.all()
+            limit = get_recipes_limit(self.request)
+            if limit is not None:
+                recipes = recipes[:limit]
+        data['recipes'] = [
+            self.recipe.to_representation(recipe) for recipe in recipes]
+        data['recipes_count'] = author.recipes_count
+        return data
+
+    def is_subscribed(self, follow):
+        if self.request is None or self.request.user.is_anonymous:
+            return False
+        if hasattr(follow, 'is_subscribed'):
+            return follow.is_subscribed
+        return True
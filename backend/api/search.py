@@ -0,0 +1,129 @@
+import math
+import re
+from collections import Counter, defaultdict
+from threading import Lock
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, IntegerField, When
+from recipes.models import Recipe
+from recipes.search import SEARCH_CONFIG
+
+from api.cache import get_version
+
+NAME_WEIGHT = 4
+WORD = re.compile(r'\w+')
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ей', 'ой', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ов',
+    'ев', 'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю', 'а', 'я',
+    'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+
+
+def stem(word):
+    """
+    Грубый стеммер: отрезает самое длинное окончание, оставляя
+    основу не короче трех букв.
+    """
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def terms(text):
+    text = text.lower().replace('ё', 'е')
+    return [stem(word) for word in WORD.findall(text)]
+
+
+class RecipeSearchIndex:
+    """
+    Обратный индекс по названиям и поисковым документам рецептов.
+
+    Запасной вариант полнотекстового поиска для SQLite: ищет рецепты
+    со всеми словами запроса и сортирует их по TF-IDF, слова
+    из названия весят больше.
+    """
+    version = None
+
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        self.size = 0
+        for pk, name, document in rows:
+            weights = Counter(terms(document))
+            for term in terms(name):
+                weights[term] += NAME_WEIGHT
+            for term, weight in weights.items():
+                self.postings[term][pk] = weight
+            self.size += 1
+
+    @classmethod
+    def from_database(cls):
+        return cls(Recipe.objects.values_list(
+            'pk', 'name', 'search_document').iterator())
+
+    def search(self, query):
+        """
+        Найденные рецепты, сгруппированные по убыванию релевантности:
+        список списков id.
+        """
+        postings = [self.postings.get(term, {}) for term in set(terms(query))]
+        if not postings:
+            return []
+        postings.sort(key=len)
+        groups = defaultdict(list)
+        for pk in postings[0]:
+            if all(pk in posting for posting in postings[1:]):
+                score = sum(
+                    posting[pk] * math.log(1 + self.size / len(posting))
+                    for posting in postings
+                )
+                groups[round(score, 6)].append(pk)
+        return [groups[score] for score in sorted(groups, reverse=True)]
+
+
+_index = None
+_lock = Lock()
+
+
+def get_search_index():
+    global _index
+    version = get_version(Recipe)
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = RecipeSearchIndex.from_database()
+                _index.version = version
+            index = _index
+    return index
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты, подходящие под запрос, от самых релевантных.
+
+    В PostgreSQL поиск идет по search_vector через GIN-индекс,
+    в остальных базах - через RecipeSearchIndex в памяти.
+    """
+    if not terms(query):
+        return queryset
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+    groups = get_search_index().search(query)
+    if not groups:
+        return queryset.none()
+    return queryset.filter(
+        pk__in=[pk for group in groups for pk in group]
+    ).order_by(
+        Case(
+            *(When(pk__in=group, then=position)
+              for position, group in enumerate(groups)),
+            output_field=IntegerField(),
+        ),
+        '-pk',
+    )
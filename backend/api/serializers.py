@@ -1,12 +1,24 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from recipes.cart import change_recipe_in_carts
+from recipes.counters import change_counter, lock_recipes
 from recipes.models import (Favorite, Ingredient, IngredInRecipe, Recipe,
                             ShoppingList, Tag)
+from recipes.search import refresh_search_document
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from users.models import Follow
 
+from api.authentication import UserRefreshToken
+from api.fields import DeferredBase64ImageField, ImageRenditionField
+from api.paginations import get_recipes_limit
+
 User = get_user_model()
 
 
@@ -22,6 +34,8 @@ class CreateUserSerializer(UserSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return Follow.objects.filter(user=request.user, author=obj).exists()
 
 
@@ -43,6 +57,30 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         return data
 
 
+class TokenRefreshSerializer(serializers.Serializer):
+    """
+    Новый access-токен по refresh-токену. Пользователь читается
+    из БД: заблокированный не получит токен, а поля в токене
+    обновятся.
+    """
+    refresh = serializers.CharField(write_only=True)
+
+    def validate_refresh(self, value):
+        try:
+            token = RefreshToken(value)
+        except TokenError as error:
+            raise serializers.ValidationError(error.args[0])
+        user = User.objects.filter(
+            pk=token[api_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise serializers.ValidationError('Пользователь не найден.')
+        return user
+
+    def to_representation(self, attrs):
+        refresh = UserRefreshToken.for_user(attrs['refresh'])
+        return {'auth_token': str(refresh.access_token)}
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -69,10 +107,11 @@ class IngredInRecipeSerializer(serializers.ModelSerializer):
 
 class RecipeShortInfoSerializer(serializers.ModelSerializer):
     image = Base64ImageField(required=False, allow_null=False)
+    image_thumbnail = ImageRenditionField('thumbnail')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail', 'cooking_time')
 
 
 class GetRecipeSerializer(serializers.ModelSerializer):
@@ -81,34 +120,47 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredInRecipeSerializer(many=True,
                                            source='ingredinrecipe_set')
     image = Base64ImageField()
+    image_card = ImageRenditionField('card')
+    image_thumbnail = ImageRenditionField('thumbnail')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
-    def get_ingredients(self, obj):
-        ingredients = IngredInRecipe.objects.filter(recipe=obj)
-        return IngredInRecipeSerializer(ingredients, many=True).data
-
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        state = self.context.get('recipe_state')
+        if state is not None:
+            return obj.pk in state.favorites
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return Favorite.objects.filter(user=request.user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        state = self.context.get('recipe_state')
+        if state is not None:
+            return obj.pk in state.shopping_cart
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return ShoppingList.objects.filter(
             user=request.user, recipe=obj).exists()
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'author', 'name', 'image', 'text', 'ingredients',
-            'tags', 'cooking_time', 'is_favorited', 'is_in_shopping_cart')
+            'id', 'author', 'name', 'image', 'image_card', 'image_thumbnail',
+            'text', 'ingredients', 'tags', 'cooking_time', 'is_favorited',
+            'is_in_shopping_cart')
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
+    toggle_errors = {
+        'POST': {'non_field_errors': ['Этот рецепт уже есть в избранном']},
+        'DELETE': {'non_field_errors': ['Этого рецепта нет в избранном']},
+    }
     user = serializers.SlugRelatedField(
         slug_field='username', default=serializers.CurrentUserDefault(),
         read_only=True
@@ -117,20 +169,6 @@ class FavoriteSerializer(serializers.ModelSerializer):
         queryset=Recipe.objects.all()
     )
 
-    def validate(self, obj):
-        user = self.context.get('request').user
-        recipe = obj['recipe']
-        favorite = Favorite.objects.filter(user=user, recipe=recipe).exists()
-        if self.context.get('request').method == 'POST' and favorite:
-            raise serializers.ValidationError(
-                'Этот рецепт уже есть в избранном'
-            )
-        if self.context.get('request').method == 'DELETE' and not favorite:
-            raise serializers.ValidationError(
-                'Этого рецепта нет в избранном'
-            )
-        return obj
-
     def to_representation(self, instance):
         context = {"request": self.context.get("request")}
         return RecipeShortInfoSerializer(instance.recipe, context=context).data
@@ -141,6 +179,10 @@ class FavoriteSerializer(serializers.ModelSerializer):
 
 
 class ShoppingListSerializer(FavoriteSerializer):
+    toggle_errors = {
+        'POST': {'non_field_errors': ['Этот рецепт уже есть в корзине']},
+        'DELETE': {'non_field_errors': ['Этого рецепта нет в корзине']},
+    }
     user = serializers.SlugRelatedField(
         slug_field='username', default=serializers.CurrentUserDefault(),
         read_only=True
@@ -152,29 +194,21 @@ class ShoppingListSerializer(FavoriteSerializer):
     class Meta(FavoriteSerializer.Meta):
         model = ShoppingList
 
-    def validate(self, obj):
-        user = self.context.get('request').user
-        recipe = obj['recipe']
-        favorite = ShoppingList.objects.filter(
-            user=user, recipe=recipe).exists()
-        if self.context.get('request').method == 'POST' and favorite:
-            raise serializers.ValidationError(
-                'Этот рецепт уже есть в корзине'
-            )
-        if self.context.get('request').method == 'DELETE' and not favorite:
-            raise serializers.ValidationError(
-                'Этого рецепта нет в корзине'
-            )
-        return obj
 
-    def to_representation(self, instance):
-        context = {"request": self.context.get("request")}
-        return RecipeShortInfoSerializer(instance.recipe, context=context).data
+class BulkRecipesSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     author = CreateUserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = DeferredBase64ImageField()
     ingredients = IngredInRecipeSerializer(
         many=True, source='ingredinrecipe_set')
     tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
@@ -204,6 +238,13 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Ингредиент должен быть уникальный!'
             )
+        existing = Ingredient.objects.filter(
+            id__in=unique_ingredients).values_list('id', flat=True)
+        missing = unique_ingredients.difference(existing)
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {sorted(missing)}'
+            )
         return data
 
     def validate_tags(self, data):
@@ -219,36 +260,85 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return data
 
     def add_recipe_ingredient(self, ingredients, recipe):
-        for ingredient in ingredients:
-            IngredInRecipe.objects.create(
+        IngredInRecipe.objects.bulk_create(
+            IngredInRecipe(
                 ingredient_id=ingredient.get('ingredient')['id'],
                 recipe=recipe,
                 amount=ingredient.get('amount'),
             )
+            for ingredient in ingredients
+        )
 
+    def update_recipe_ingredient(self, ingredients, recipe):
+        """
+        Применяет к рецепту только разницу между старым и новым
+        составом: неизмененные строки не перезаписываются.
+        Возвращает разницу {id ингредиента: количество}.
+        """
+        amounts = {
+            ingredient.get('ingredient')['id']: ingredient.get('amount')
+            for ingredient in ingredients
+        }
+        deltas = dict(amounts)
+        stale, changed = [], []
+        for row in IngredInRecipe.objects.filter(recipe=recipe):
+            amount = amounts.pop(row.ingredient_id, None)
+            deltas[row.ingredient_id] = (amount or 0) - row.amount
+            if amount is None:
+                stale.append(row.pk)
+            elif row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if stale:
+            IngredInRecipe.objects.filter(pk__in=stale).delete()
+        if changed:
+            IngredInRecipe.objects.bulk_update(changed, ('amount',))
+        self.add_recipe_ingredient(
+            ({'ingredient': {'id': ingredient_id}, 'amount': amount}
+             for ingredient_id, amount in amounts.items()),
+            recipe
+        )
+        return deltas
+
+    @transaction.atomic
     def create(self, validated_data):
-        image = validated_data.pop('image')
+        image = validated_data.pop('image', None)
         tags_data = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredinrecipe_set')
-        recipe = Recipe.objects.create(image=image, **validated_data)
+        recipe = Recipe.objects.create(
+            image=image.name if image is not None else '', **validated_data)
+        if image is not None:
+            image.schedule()
+        change_counter(Recipe, (recipe.author_id,), 1)
         self.add_recipe_ingredient(ingredients, recipe)
         recipe.tags.set(tags_data)
+        refresh_search_document((recipe.pk,))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.image = validated_data.get('image', instance.image)
+        lock_recipes((instance.pk,))
+        image = validated_data.get('image')
+        if image is not None:
+            if image.name != instance.image.name:
+                instance.image = image.name
+                instance.renditions_ready = False
+            image.schedule()
+        ingredients = validated_data.get('ingredinrecipe_set')
+        if ingredients is not None:
+            change_recipe_in_carts(
+                instance.pk,
+                self.update_recipe_ingredient(ingredients, instance))
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time
         )
-        instance.tags.clear()
-        tags = self.initial_data.get('tags')
-        instance.tags.set(tags)
-        IngredInRecipe.objects.filter(recipe=instance).all().delete()
-        ingredients = validated_data.get('ingredinrecipe_set')
-        self.add_recipe_ingredient(ingredients, instance)
         instance.save()
+        tags = validated_data.get('tags')
+        if tags is not None:
+            instance.tags.set(tags)
+        refresh_search_document((instance.pk,))
         return instance
 
     def get_is_favorited(self, obj):
@@ -265,6 +355,14 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             user=request.user, recipe=obj).exists()
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            (instance,),
+            'tags',
+            Prefetch(
+                'ingredinrecipe_set',
+                queryset=IngredInRecipe.objects.select_related('ingredient')
+            ),
+        )
         serializer = GetRecipeSerializer(instance)
         return serializer.data
 
@@ -279,6 +377,10 @@ class RecipeInFollowListSerializer(serializers.ModelSerializer):
 
 
 class FollowCheckSubscribeSerializer(serializers.ModelSerializer):
+    toggle_errors = {
+        'POST': {'errors': 'Вы уже подписаны на этого автора'},
+        'DELETE': {'errors': 'Ошибка, вы уже отписались'},
+    }
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     recipes_count = serializers.SerializerMethodField(read_only=True)
     recipes = serializers.SerializerMethodField(read_only=True)
@@ -288,54 +390,32 @@ class FollowCheckSubscribeSerializer(serializers.ModelSerializer):
         fields = ('user', 'author', 'is_subscribed',
                   'recipes', 'recipes_count')
 
-    def validate(self, obj):
-        user = obj['user']
-        author = obj['author']
-
-        is_subscribed = user.subscribed_to.filter(author_id=author).exists()
-        if self.context.get('request').method == 'POST':
-            if user == author:
-                raise serializers.ValidationError(
-                    {'errors': 'Подписка на самого себя не разрешена'}
-                )
-            if is_subscribed:
-                raise serializers.ValidationError(
-                    {'errors': 'Вы уже подписаны на этого автора'}
-                )
-        if self.context.get('request').method == 'DELETE':
-            if user == author:
-                raise serializers.ValidationError(
-                    {'errors': 'Отписка от самого себя не разрешена'}
-                )
-            if not is_subscribed:
-                raise serializers.ValidationError(
-                    {'errors': 'Ошибка, вы уже отписались'}
-                )
-        return obj
-
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return Follow.objects.filter(
             user=request.user, author_id=obj.author).exists()
 
     def get_recipes(self, obj):
-        queryset = Recipe.objects.filter(author=obj.author.id)
-
-        if queryset:
-            queryset = Recipe.objects.filter(
-                author=obj.author)
-        return RecipeShortInfoSerializer(queryset, many=True).data
+        recipes = getattr(obj.author, 'feed_recipes', None)
+        if recipes is None:
+            recipes = obj.author.recipes.all()
+            limit = get_recipes_limit(self.context.get('request'))
+            if limit is not None:
+                recipes = recipes[:limit]
+        return RecipeShortInfoSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.recipes_count
 
 
 class FollowSerializer(FollowCheckSubscribeSerializer):
     email = serializers.ReadOnlyField(source='author.email')
     id = serializers.ReadOnlyField(source='author.id')
-    username = serializers.ReadOnlyField(source='author.user_name')
+    username = serializers.ReadOnlyField(source='author.username')
     first_name = serializers.ReadOnlyField(source='author.first_name')
     last_name = serializers.ReadOnlyField(source='author.last_name')
 
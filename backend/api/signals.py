@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from recipes.cart import change_recipe_in_carts, recipe_totals
+from recipes.counters import lock_recipes
+from recipes.models import Ingredient, IngredInRecipe, Recipe, Tag
+from recipes.search import refresh_search_document
+from rest_framework.authtoken.models import Token
+
+from api.authentication import forget_tokens
+from api.cache import bump_version
+from api.cookable import record_change
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version(Tag)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version(Ingredient)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_document(
+            IngredInRecipe.objects.filter(ingredient=instance)
+            .values_list('recipe_id', flat=True)
+        )
+        transaction.on_commit(lambda: bump_version(Recipe))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    recipe_id = instance.pk
+
+    def publish():
+        bump_version(Recipe)
+        record_change(recipe_id)
+
+    transaction.on_commit(publish)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    lock_recipes((instance.pk,))
+    change_recipe_in_carts(instance.pk, {
+        ingredient_id: -total
+        for ingredient_id, total in recipe_totals((instance.pk,)).items()
+    })
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_tokens((instance.key,))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, **kwargs):
+    if not created:
+        forget_tokens(
+            Token.objects.filter(user=instance).values_list('key', flat=True))
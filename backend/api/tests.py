@@ -0,0 +1,250 @@
+from random import Random
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from recipes.models import (Favorite, Ingredient, IngredInRecipe, Recipe,
+                            ShoppingList, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+from api import cookable
+from api.cookable import CookableIndex, find_cookable, record_change
+
+LIMITS = (6, 20, 100)
+
+
+class RecipeQueryCountTest(TestCase):
+    """
+    Число SQL-запросов списка и карточки рецепта не зависит
+    от размера страницы.
+    """
+    LIST_QUERIES = {'anonymous': 5, 'token': 8}
+    DETAIL_QUERIES = {'anonymous': 4, 'token': 7}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Читатель', last_name='Тестовый', password='pass')
+        authors = [
+            User.objects.create_user(
+                email=f'author{number}@foodgram.ru',
+                username=f'author{number}', first_name='Автор',
+                last_name=str(number), password='pass')
+            for number in range(5)
+        ]
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}',
+                               color=f'#00000{number}')
+            for number in range(3)
+        ]
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=authors[number % len(authors)],
+                   name=f'Рецепт {number}', image='recipes/test.png',
+                   text='Текст', cooking_time=10)
+            for number in range(max(LIMITS) + 10)
+        )
+        IngredInRecipe.objects.bulk_create(
+            IngredInRecipe(recipe=recipe,
+                           ingredient=ingredients[(number + shift) % 10],
+                           amount=shift + 1)
+            for number, recipe in enumerate(recipes)
+            for shift in range(3)
+        )
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            through(recipe=recipe, tag=tags[number % len(tags)])
+            for number, recipe in enumerate(recipes)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2])
+        ShoppingList.objects.bulk_create(
+            ShoppingList(user=cls.user, recipe=recipe)
+            for recipe in recipes[::3])
+        Follow.objects.create(user=cls.user, author=authors[0])
+        cls.token = Token.objects.create(user=cls.user)
+        cls.recipe = recipes[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def clients(self):
+        token = APIClient()
+        token.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return {'anonymous': APIClient(), 'token': token}
+
+    def test_list_queries(self):
+        for name, client in self.clients().items():
+            for limit in LIMITS:
+                with self.subTest(user=name, limit=limit):
+                    cache.clear()
+                    with self.assertNumQueries(self.LIST_QUERIES[name]):
+                        response = client.get(
+                            '/api/recipes/', {'limit': limit})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_detail_queries(self):
+        for name, client in self.clients().items():
+            with self.subTest(user=name):
+                with self.assertNumQueries(self.DETAIL_QUERIES[name]):
+                    response = client.get(f'/api/recipes/{self.recipe.pk}/')
+                self.assertEqual(response.status_code, 200)
+
+
+def positions_to_ids(index, mask):
+    return {
+        recipe_id for position, recipe_id in enumerate(index.recipe_ids)
+        if mask >> position & 1
+    }
+
+
+def brute_force_hits(compositions, ingredient_ids):
+    wanted = set(ingredient_ids)
+    return {
+        recipe_id: len(wanted & set(ingredients))
+        for recipe_id, ingredients in compositions.items()
+        if wanted & set(ingredients)
+    }
+
+
+class CookableIndexTest(SimpleTestCase):
+    """
+    Побитовый подсчет совпадений сверяется с прямым пересечением
+    множеств, в том числе для масок из LRU (DENSE_RATIO = 0).
+    """
+    COMPOSITIONS = {
+        1: [1, 2, 3],
+        2: [1],
+        3: [2, 3, 4, 5],
+        4: [6],
+    }
+
+    def build(self, compositions):
+        return CookableIndex(
+            (recipe_id, ingredient_id)
+            for recipe_id, ingredients in compositions.items()
+            for ingredient_id in ingredients
+        )
+
+    def test_count_hits(self):
+        index = self.build(self.COMPOSITIONS)
+        by_hits = index.count_hits([1, 2, 3, 3, 99])
+        self.assertEqual(
+            {hits: positions_to_ids(index, mask)
+             for hits, mask in by_hits.items()},
+            {3: {1}, 2: {3}, 1: {2}},
+        )
+
+    def test_search_order_and_limit(self):
+        index = self.build(self.COMPOSITIONS)
+        self.assertEqual(
+            index.search([1, 2, 3], 10),
+            [(1, 1.0, 3), (2, 1.0, 1), (3, 0.5, 2)],
+        )
+        self.assertEqual(index.search([1, 2, 3], 1), [(1, 1.0, 3)])
+        self.assertEqual(index.search([42], 10), [])
+
+    def test_random_compositions(self):
+        random = Random(2)
+        compositions = {
+            recipe_id: random.sample(range(1, 40), random.randint(1, 12))
+            for recipe_id in random.sample(range(1, 1000), 300)
+        }
+        for dense_ratio in (cookable.DENSE_RATIO, 0):
+            with mock.patch.object(cookable, 'DENSE_RATIO', dense_ratio):
+                index = self.build(compositions)
+            for _ in range(20):
+                query = random.sample(range(1, 45), random.randint(1, 20))
+                with self.subTest(dense_ratio=dense_ratio, query=query):
+                    hits = {
+                        recipe_id: hits
+                        for hits, mask in index.count_hits(query).items()
+                        for recipe_id in positions_to_ids(index, mask)
+                    }
+                    self.assertEqual(
+                        hits, brute_force_hits(compositions, query))
+                    found = index.search(query, len(compositions))
+                    self.assertEqual(
+                        {recipe_id: hits for recipe_id, _, hits in found},
+                        hits)
+                    keys = [(fraction, hits) for _, fraction, hits in found]
+                    self.assertEqual(keys, sorted(keys, reverse=True))
+
+
+class CookableIndexUpdateTest(TestCase):
+    """
+    Индекс, догнавший журнал, отвечает так же, как построенный заново.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='cook@foodgram.ru', username='cook', first_name='Повар',
+            last_name='Тестовый', password='pass')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Продукт {number}', measurement_unit='г')
+            for number in range(8)
+        )
+        cls.recipes = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Блюдо {number}',
+                   image='recipes/test.png', text='Текст', cooking_time=5)
+            for number in range(6)
+        )
+        IngredInRecipe.objects.bulk_create(
+            IngredInRecipe(recipe=recipe,
+                           ingredient=cls.ingredients[(number + shift) % 8],
+                           amount=1)
+            for number, recipe in enumerate(cls.recipes)
+            for shift in range(number % 3 + 1)
+        )
+
+    def setUp(self):
+        cache.clear()
+        cookable._index = None
+        self.query = [ingredient.pk for ingredient in self.ingredients[:4]]
+
+    def change_recipes(self):
+        first, second = self.recipes[:2]
+        IngredInRecipe.objects.filter(recipe=first).delete()
+        IngredInRecipe.objects.create(
+            recipe=second, ingredient=self.ingredients[3], amount=1)
+        return first, second
+
+    def fresh_search(self):
+        return CookableIndex.from_database().search(self.query, 100)
+
+    def test_update_recipes(self):
+        for dense_ratio in (cookable.DENSE_RATIO, 0):
+            with self.subTest(dense_ratio=dense_ratio):
+                with mock.patch.object(cookable, 'DENSE_RATIO', dense_ratio):
+                    index = CookableIndex.from_database()
+                with transaction.atomic():
+                    changed = self.change_recipes()
+                    index.update_recipes({recipe.pk for recipe in changed})
+                    self.assertEqual(index.search(self.query, 100),
+                                     self.fresh_search())
+                    transaction.set_rollback(True)
+
+    def test_journal_replay(self):
+        record_change(self.recipes[0].pk)
+        find_cookable(self.query, 100)
+        for recipe in self.change_recipes():
+            record_change(recipe.pk)
+        self.assertEqual(find_cookable(self.query, 100), self.fresh_search())
+
+    def test_sequence_reset_rebuilds_index(self):
+        record_change(self.recipes[0].pk)
+        find_cookable(self.query, 100)
+        cache.clear()
+        for recipe in self.change_recipes():
+            record_change(recipe.pk)
+        self.assertEqual(find_cookable(self.query, 100), self.fresh_search())
+        cache.clear()
+        self.assertEqual(find_cookable(self.query, 100), self.fresh_search())
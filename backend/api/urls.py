@@ -1,7 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UsersViewSet
+from .views import (IngredientViewSet, InstrumentationView, LoginView,
+                    RecipeViewSet, TagViewSet, TokenRefreshView,
+                    UsersViewSet)
 
 users_router = DefaultRouter()
 users_router.register(r'users', UsersViewSet)
@@ -13,8 +15,11 @@ router.register(r'recipes', RecipeViewSet)
 router.register(r'tags', TagViewSet)
 
 urlpatterns = [
+    path('instrumentation/', InstrumentationView.as_view()),
     path('', include(users_router.urls)),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
+    path('auth/token/login/', LoginView.as_view()),
+    path('auth/token/refresh/', TokenRefreshView.as_view()),
     path('auth/', include('djoser.urls.authtoken')),
 ]
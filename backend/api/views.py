@@ -1,41 +1,133 @@
+from collections import defaultdict
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import F, Q, Sum, Exists, OuterRef
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Value, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from djoser.views import UserViewSet
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingList, Tag
-from rest_framework import viewsets
+from djoser.views import TokenCreateView, UserViewSet
+from recipes.counters import change_counter
+from recipes.models import (CartIngredient, Favorite, Ingredient,
+                            IngredInRecipe, Recipe, ShoppingList, Tag)
+from recipes.units import merge_units
+from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from users.models import Follow
 
+from api.authentication import UserRefreshToken
+from api.autocomplete import autocomplete_ingredients
+from api.cache import CachedReferenceMixin
+from api.cookable import find_cookable
 from api.filters import IngredFilter, RecipeFilter
-from api.paginations import LimitPagination
+from api.instrumentation import registry
+from api.paginations import FeedPagination, get_recipes_limit
 from api.permissions import IsAuthorOrReadOnly
+from api.recipe_state import get_recipe_state
+from api.renderers import SHOPPING_CART_RENDERERS
+from api.representations import (FastFollowSerializer,
+                                 FastIngredientSerializer,
+                                 FastRecipeSerializer, FastTagSerializer)
 
 from .mixins import CustomMethodViewSet, CustomViewSet
 from .serializers import (CreateUserSerializer, FavoriteSerializer,
-                          FollowSerializer, GetRecipeSerializer,
                           IngredientSerializer, RecipeCreateSerializer,
-                          ShoppingListSerializer, TagSerializer,
+                          RecipeShortInfoSerializer, ShoppingListSerializer,
+                          TokenRefreshSerializer,
                           FollowCheckSubscribeSerializer)
 
 User = get_user_model()
 
 
+def newest_recipes(author_ids, limit=None):
+    """
+    Рецепты авторов author_ids, не больше limit последних у каждого.
+
+    Номер рецепта внутри автора считает ROW_NUMBER() по индексу
+    (author, -pub_date, -id), поэтому запрос не растет с числом
+    рецептов у автора сверх limit.
+    """
+    recipes = Recipe.objects.filter(author_id__in=author_ids)
+    if limit is not None:
+        ranked = (
+            recipes.order_by()
+            .annotate(row_number=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            ))
+            .values('pk', 'row_number')
+        )
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.filter(pk__in=RawSQL(
+            f'SELECT "id" FROM ({sql}) AS "ranked" '
+            f'WHERE "row_number" <= %s',
+            (*params, limit),
+        ))
+    return recipes.order_by('-pub_date', '-id')
+
+
 class UsersViewSet(UserViewSet, CustomMethodViewSet):
     """
     Вьюсет для пользователя.
     """
     serializer_class = CreateUserSerializer
+    pagination_class = FeedPagination
+
+    def get_cursor_ordering(self):
+        if self.action == 'subscriptions':
+            return ('author_id',)
+        return ('id',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            return queryset.annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, author=OuterRef('pk'))
+                )
+            )
+        return queryset
+
+    def get_subscriptions_queryset(self):
+        return (
+            Follow.objects
+            .filter(user=self.request.user)
+            .select_related('author')
+            .annotate(is_subscribed=Value(True))
+            .order_by('author_id')
+        )
+
+    def attach_feed_recipes(self, follows):
+        """
+        Кладет авторам страницы их последние рецепты в feed_recipes
+        одним запросом.
+        """
+        follows = list(follows)
+        limit = get_recipes_limit(self.request)
+        recipes = defaultdict(list)
+        if follows and limit != 0:
+            for recipe in newest_recipes(
+                    [follow.author_id for follow in follows], limit):
+                recipes[recipe.author_id].append(recipe)
+        for follow in follows:
+            follow.author.feed_recipes = recipes[follow.author_id]
+        return follows
 
     @action(detail=False, permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
-        user = request.user
-        queryset = Follow.objects.filter(user=user)
-        pages = self.paginate_queryset(queryset)
-        serializer = FollowSerializer(
+        pages = self.attach_feed_recipes(
+            self.paginate_queryset(self.get_subscriptions_queryset()))
+        serializer = FastFollowSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
@@ -46,33 +138,45 @@ class UsersViewSet(UserViewSet, CustomMethodViewSet):
         permission_classes=(IsAuthenticated, )
     )
     def subscribe(self, request, id=None):
-        author = get_object_or_404(User, id=id)
+        if id == str(request.user.pk):
+            raise ValidationError({'errors': (
+                'Подписка на самого себя не разрешена'
+                if request.method == 'POST'
+                else 'Отписка от самого себя не разрешена')})
         return self.post_delete_method(Follow,
                                        FollowCheckSubscribeSerializer,
-                                       id, Q(author=author))
+                                       User.objects.all(), id)
 
 
-class TagViewSet(CustomViewSet):
+class TagViewSet(CachedReferenceMixin, CustomViewSet):
     """
     Вьюсет для тэгов.
     """
+    cache_model = Tag
     queryset = Tag.objects.all()
-    serializer_class = TagSerializer
+    serializer_class = FastTagSerializer
     permission_classes = (AllowAny, )
     pagination_class = None
 
 
-class IngredientViewSet(CustomViewSet):
+class IngredientViewSet(CachedReferenceMixin, CustomViewSet):
     """
     Вьюсет для ингридиентов.
     """
+    cache_model = Ingredient
     queryset = Ingredient.objects.all()
-    serializer_class = IngredientSerializer
+    serializer_class = FastIngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredFilter
     permission_classes = (AllowAny, )
     pagination_class = None
 
+    @action(detail=False)
+    def autocomplete(self, request):
+        return Response(
+            autocomplete_ingredients(request.query_params.get('name', ''))
+        )
+
 
 class RecipeViewSet(viewsets.ModelViewSet, CustomMethodViewSet):
     """
@@ -82,66 +186,187 @@ class RecipeViewSet(viewsets.ModelViewSet, CustomMethodViewSet):
     filter_backends = (DjangoFilterBackend,)
     permission_classes = (IsAuthorOrReadOnly, )
     filterset_class = RecipeFilter
-    pagination_class = LimitPagination
+    pagination_class = FeedPagination
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
-            return GetRecipeSerializer
+            return FastRecipeSerializer
         return RecipeCreateSerializer
 
     def get_queryset(self):
-        queryset = (
-            Recipe.objects
-            .select_related('author')
-            .prefetch_related('tags', 'ingredients')
-        )
-        if self.request.user.is_authenticated:
-            return queryset.annotate(
-                is_favorited=Exists(Favorite.objects.filter(
-                    user=self.request.user, recipe__pk=OuterRef('pk'))
-                ),
-                is_in_shopping_cart=Exists(ShoppingList.objects.filter(
-                    user=self.request.user, recipe__pk=OuterRef('pk'))
+        user = self.request.user
+        authors = User.objects.all()
+        if user.is_authenticated:
+            authors = authors.annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, author=OuterRef('pk'))
                 )
             )
-        return queryset
+        return Recipe.objects.prefetch_related(
+            Prefetch('author', queryset=authors),
+            'tags',
+            Prefetch(
+                'ingredinrecipe_set',
+                queryset=IngredInRecipe.objects.select_related('ingredient')
+            ),
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.user.is_authenticated:
+            context['recipe_state'] = get_recipe_state(self.request)
+        return context
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        author_id = instance.author_id
+        instance.delete()
+        change_counter(Recipe, (author_id,), -1)
+
     @action(methods=['post', 'delete'], detail=True,
             permission_classes=(IsAuthenticated,))
     def favorite(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, id=pk)
         return self.post_delete_method(Favorite, FavoriteSerializer,
-                                       pk, Q(recipe=recipe))
+                                       Recipe.objects.all(), pk)
 
     @action(methods=['post', 'delete'],
             detail=True,
             permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
         return self.post_delete_method(ShoppingList, ShoppingListSerializer,
-                                       pk, Q(recipe=recipe))
+                                       Recipe.objects.all(), pk)
 
-    @action(methods=['get'], detail=False,
+    @action(methods=['post', 'delete'], detail=False,
+            url_path='favorite', permission_classes=(IsAuthenticated,))
+    def favorite_bulk(self, request):
+        return self.bulk_method(Favorite)
+
+    @action(methods=['post', 'delete'], detail=False,
+            url_path='shopping_cart', permission_classes=(IsAuthenticated,))
+    def shopping_cart_bulk(self, request):
+        return self.bulk_method(ShoppingList)
+
+    @action(methods=['delete'], detail=False,
+            url_path='shopping_cart/clear',
             permission_classes=(IsAuthenticated,))
-    def download_shopping_cart(self, request):
-        cart_list = []
-        text = 'Список покупок:\n\n'
-        user = request.user
-        ingredients = Ingredient.objects.filter(
-            recipe__list__user=user).values(
-            'name',
-            measurement=F('measurement_unit')
-        ).annotate(total=Sum('ingredinrecipe__amount'))
-        for _ in ingredients:
-            cart_list.append(
-                f'{_["name"]}: {_["total"]} {_["measurement"]}'
+    def clear_shopping_cart(self, request):
+        removed = self.remove_recipes(ShoppingList)
+        return Response({'results': [
+            {'id': recipe_id, 'status': 'removed'} for recipe_id in removed
+        ]})
+
+    @action(detail=False)
+    def what_can_i_cook(self, request):
+        ingredient_ids = []
+        for value in request.query_params.getlist('ingredients'):
+            for item in value.split(','):
+                try:
+                    ingredient_ids.append(int(item))
+                except ValueError:
+                    raise ValidationError(
+                        {'ingredients': f'Неверный id ингредиента: {item}'})
+        if not ingredient_ids:
+            raise ValidationError({'ingredients': 'Укажите ингредиенты.'})
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            raise ValidationError({'limit': 'Лимит должен быть числом.'})
+        found = find_cookable(ingredient_ids, max(limit, 0))
+        recipes = Recipe.objects.in_bulk([item[0] for item in found])
+        missing = defaultdict(list)
+        rows = (
+            IngredInRecipe.objects
+            .filter(recipe_id__in=recipes)
+            .exclude(ingredient_id__in=ingredient_ids)
+            .select_related('ingredient')
+            .order_by('ingredient__name')
+        )
+        for row in rows:
+            missing[row.recipe_id].append(row.ingredient)
+        context = self.get_serializer_context()
+        return Response([
+            dict(
+                RecipeShortInfoSerializer(
+                    recipes[recipe_id], context=context).data,
+                coverage=round(coverage, 4),
+                missing=IngredientSerializer(
+                    missing[recipe_id], many=True).data,
             )
-        text += '\n'.join(cart_list)
-        filname = 'shopping_list.txt'
-        response = HttpResponse(text, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={filname}'
+            for recipe_id, coverage, _ in found
+            if recipe_id in recipes
+        ])
 
+    @action(methods=['get'], detail=False,
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=SHOPPING_CART_RENDERERS)
+    def download_shopping_cart(self, request):
+        ingredients = (
+            CartIngredient.objects
+            .filter(user=request.user)
+            .values(
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'),
+                total=F('amount'),
+            )
+            .order_by('name', 'measurement_unit')
+        )
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(merge_units(ingredients.iterator())),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={renderer.get_filename()}'
+        )
         return response
+
+
+class InstrumentationView(APIView):
+    """
+    Отчет InstrumentationMiddleware: перцентили по эндпоинтам.
+    DELETE обнуляет накопленные метрики.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(registry.report())
+
+    def delete(self, request):
+        registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class LoginView(TokenCreateView):
+    """
+    Вход через djoser. При AUTH_MODE=jwt вместо ключа из БД выдается
+    короткоживущий access-токен в auth_token и refresh-токен.
+    """
+    def _action(self, serializer):
+        if settings.AUTH_MODE != 'jwt':
+            return super()._action(serializer)
+        user = serializer.user
+        user_logged_in.send(sender=user.__class__, request=self.request,
+                            user=user)
+        refresh = UserRefreshToken.for_user(user)
+        return Response({'auth_token': str(refresh.access_token),
+                         'refresh': str(refresh)})
+
+
+class TokenRefreshView(generics.GenericAPIView):
+    """
+    Новый access-токен по refresh-токену.
+    """
+    serializer_class = TokenRefreshSerializer
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data)
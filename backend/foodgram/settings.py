@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -54,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.instrumentation.InstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -97,6 +99,42 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT', default=5432),
     }
 }
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+# Кэш токенов, версии справочников, состояние рецептов и журнал
+# изменений для what_can_i_cook сбрасываются через кэш. LocMemCache
+# у каждого процесса свой, поэтому с несколькими воркерами нужен общий
+# кэш (Redis или Memcached в CACHE_BACKEND). Без него кэш токенов
+# выключается, а manage.py check --deploy выдает предупреждение api.W001.
+SHARED_CACHE = not CACHES['default']['BACKEND'].endswith(
+    ('LocMemCache', 'DummyCache'))
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+RECIPE_STATE_TIMEOUT = 60 * 5
+
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 5
+
+# token - ключи в БД (djoser authtoken), jwt - подписанные токены,
+# которые проверяются без обращения к БД; старые ключи тоже принимаются.
+AUTH_MODE = os.getenv('AUTH_MODE', default='token')
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_MINUTES', default=15))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_DAYS', default=7))),
+    'AUTH_HEADER_TYPES': ('Bearer', 'Token'),
+}
+
 #Password validation
 #https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -122,7 +160,20 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        *(['api.authentication.StatelessJWTAuthentication']
+          if AUTH_MODE == 'jwt' else []),
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 
     'DEFAULT_FILTER_BACKENDS': [
@@ -175,3 +226,24 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# TTF-шрифт с кириллицей для списка покупок в PDF; без файла шрифта
+# формат PDF не предлагается.
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+TRENDING_HALF_LIFE = 60 * 60 * 72
+
+# refresh_ranking берет события старше этого числа секунд, чтобы
+# не пропустить еще не закоммиченные.
+RANKING_COMMIT_LAG = 60 * 5
+
+INSTRUMENTATION = os.getenv('INSTRUMENTATION', default='False') == 'True'
+
+INSTRUMENTATION_N_PLUS_ONE = 5
@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from .models import Favorite, Ingredient, IngredInRecipe, Recipe, Tag
+from .models import (Favorite, Ingredient, IngredInRecipe, Recipe,
+                     ShoppingList, Tag)
+from .cart import rebuild_cart
+from .search import refresh_search_document
 
 
 class IngredientInline(admin.TabularInline):
@@ -36,14 +39,20 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ('pk', 'author', 'name', 'text',
                     'cooking_time', 'favorited')
     list_filter = ('name', 'author', 'tags')
+    readonly_fields = ('favorites_count', 'in_carts_count')
     empty_value_display = '-empty-'
 
     inlines = [
         IngredientInline,
     ]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_search_document((form.instance.pk,))
+        rebuild_cart(ShoppingList.objects.filter(
+            recipe=form.instance).values_list('user_id', flat=True))
+
     def favorited(self, obj):
-        favorited_count = Favorite.objects.filter(recipe=obj).count()
-        return favorited_count
+        return obj.favorites_count
 
     favorited.short_description = 'В избранном'
@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from .counters import lock_users
+from .models import CartIngredient, IngredInRecipe, ShoppingList
+
+
+def recipe_totals(recipe_ids):
+    """
+    Сколько каждого ингредиента в рецептах recipe_ids:
+    {id ингредиента: количество}.
+    """
+    return dict(
+        IngredInRecipe.objects
+        .filter(recipe_id__in=recipe_ids)
+        .order_by()
+        .values_list('ingredient_id')
+        .annotate(total=Sum('amount'))
+    )
+
+
+def apply_deltas(user_ids, deltas):
+    """
+    Сдвигает итоги корзин пользователей user_ids (список или запрос)
+    на deltas {id ингредиента: количество}.
+
+    Строки пользователей блокируются, поэтому параллельные изменения
+    одной корзины идут по очереди: существующие строки обновляются
+    одним UPDATE, недостающие вставляются, обнулившиеся удаляются.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    with transaction.atomic(savepoint=False):
+        user_ids = lock_users(user_ids)
+        rows = CartIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas)
+        existing = set(rows.values_list('user_id', 'ingredient_id'))
+        if existing:
+            rows.update(amount=F('amount') + Case(
+                *(When(ingredient_id=ingredient_id, then=Value(delta))
+                  for ingredient_id, delta in deltas.items()),
+                output_field=IntegerField(),
+            ))
+        CartIngredient.objects.bulk_create(
+            CartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                           amount=delta)
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items()
+            if delta > 0 and (user_id, ingredient_id) not in existing
+        )
+        if existing and min(deltas.values()) < 0:
+            rows.filter(amount__lte=0).delete()
+
+
+def change_cart(user_id, recipe_ids, sign):
+    """
+    Добавляет (sign=1) или убирает (sign=-1) рецепты из итогов
+    корзины пользователя.
+    """
+    if recipe_ids:
+        apply_deltas((user_id,), {
+            ingredient_id: sign * total
+            for ingredient_id, total in recipe_totals(recipe_ids).items()
+        })
+
+
+def change_recipe_in_carts(recipe_id, deltas):
+    """
+    Переносит изменение состава рецепта в корзины, где он лежит.
+    Вызывающий держит блокировку рецепта (lock_recipes), иначе
+    параллельное добавление рецепта в корзину может разойтись
+    с составом.
+    """
+    apply_deltas(
+        ShoppingList.objects.filter(recipe_id=recipe_id)
+        .values_list('user_id', flat=True),
+        deltas,
+    )
+
+
+@transaction.atomic
+def rebuild_cart(user_ids=None, batch_size=5000):
+    """
+    Пересчитывает итоги корзин пользователей user_ids (или всех)
+    по ShoppingList и составам рецептов.
+    """
+    rows = CartIngredient.objects.all()
+    carts = ShoppingList.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+        carts = carts.filter(user_id__in=user_ids)
+    totals = (
+        carts
+        .order_by()
+        .values_list('user_id', 'recipe__ingredinrecipe__ingredient_id')
+        .annotate(total=Sum('recipe__ingredinrecipe__amount'))
+    )
+    rows.delete()
+    created = CartIngredient.objects.bulk_create(
+        (CartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                        amount=total)
+         for user_id, ingredient_id, total in totals.iterator()
+         if ingredient_id is not None),
+        batch_size=batch_size,
+    )
+    return len(created)
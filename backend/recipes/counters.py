@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from users.models import Follow
+
+from .models import Favorite, Recipe, ShoppingList
+
+User = get_user_model()
+
+COUNTERS = {
+    Favorite: (Recipe, 'recipe', 'favorites_count'),
+    ShoppingList: (Recipe, 'recipe', 'in_carts_count'),
+    Follow: (User, 'author', 'followers_count'),
+    Recipe: (User, 'author', 'recipes_count'),
+}
+
+
+def lock_recipes(recipe_ids):
+    """
+    Блокирует строки рецептов до конца транзакции и возвращает id
+    существующих. Порядок блокировок везде один: сначала рецепты
+    (или авторы), потом пользователи, поэтому взаимных блокировок нет.
+
+    Изменение состава рецепта и добавление его в корзину или удаление
+    из нее идут по очереди, и итоги корзин считаются по одному
+    и тому же составу.
+    """
+    return list(
+        Recipe.objects.select_for_update()
+        .filter(pk__in=recipe_ids).order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def lock_users(user_ids):
+    """
+    Блокирует строки пользователей до конца транзакции.
+
+    Нужна только пересчету корзины: итоги одного пользователя
+    меняются по очереди. Строки списков сериализует блокировка
+    рецепта или автора (см. lock_recipes).
+    """
+    return list(
+        User.objects.select_for_update()
+        .filter(pk__in=user_ids).order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def change_counter(model, target_ids, delta):
+    """
+    Сдвигает счетчик связи model у объектов target_ids на delta.
+
+    Обновление идет выражением F(), поэтому параллельные запросы
+    не затирают друг друга; счетчик не опускается ниже нуля.
+    """
+    target_model, _, field = COUNTERS[model]
+    queryset = target_model.objects.filter(pk__in=target_ids)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def count_subquery(model, relation):
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{relation: OuterRef('pk')})
+            .order_by()
+            .values(relation)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def rebuild_counters():
+    """
+    Пересчитывает все счетчики: по одному UPDATE на таблицу.
+    """
+    updates = {}
+    for model, (target_model, relation, field) in COUNTERS.items():
+        updates.setdefault(target_model, {})[field] = count_subquery(
+            model, relation)
+    return {
+        target_model._meta.label: target_model.objects.update(**fields)
+        for target_model, fields in updates.items()
+    }
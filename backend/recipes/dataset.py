@@ -0,0 +1,187 @@
+import random
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from users.models import Follow
+
+from .cart import rebuild_cart
+from .counters import rebuild_counters
+from .models import (Favorite, Ingredient, IngredInRecipe, Recipe,
+                     ShoppingList, Tag)
+from .search import refresh_search_document
+
+User = get_user_model()
+
+DATASET_PASSWORD = 'dataset-password'
+WORDS = ('суп', 'салат', 'пирог', 'каша', 'рагу', 'паста', 'запеканка',
+         'оладьи', 'котлеты', 'плов', 'борщ', 'блины', 'соус', 'омлет')
+
+
+class DatasetGenerator:
+    """
+    Синтетические данные для нагрузочных тестов и бенчмарков.
+
+    Все строки пишутся пачками через bulk_create. Имена получают
+    уникальный префикс, поэтому генератор можно запускать повторно
+    на той же базе.
+    """
+    def __init__(self, users=100, recipes=1000, tags=8,
+                 ingredients_per_recipe=(5, 40), tags_per_recipe=(1, 3),
+                 follows_per_user=10, favorites_per_user=20,
+                 cart_per_user=5, batch_size=5000, seed=0, prefix=None,
+                 log=None):
+        self.users = users
+        self.recipes = recipes
+        self.tags = tags
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.tags_per_recipe = tags_per_recipe
+        self.follows_per_user = follows_per_user
+        self.favorites_per_user = favorites_per_user
+        self.cart_per_user = cart_per_user
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.prefix = prefix or f'ds{uuid4().hex[:6]}'
+        self.log = log or (lambda message: None)
+
+    def generate(self):
+        user_ids = self.create_users()
+        tag_ids = self.create_tags()
+        ingredient_ids = self.get_ingredients()
+        recipe_ids = self.create_recipes(user_ids)
+        self.create_recipe_tags(recipe_ids, tag_ids)
+        ingredient_rows = self.create_recipe_ingredients(
+            recipe_ids, ingredient_ids)
+        refresh_search_document(recipe_ids, batch_size=self.batch_size)
+        follows = self.create_user_links(
+            Follow, 'author_id', user_ids, user_ids, self.follows_per_user)
+        favorites = self.create_user_links(
+            Favorite, 'recipe_id', user_ids, recipe_ids,
+            self.favorites_per_user)
+        cart = self.create_user_links(
+            ShoppingList, 'recipe_id', user_ids, recipe_ids,
+            self.cart_per_user)
+        rebuild_counters()
+        rebuild_cart(user_ids)
+        return {
+            'prefix': self.prefix,
+            'users': len(user_ids),
+            'tags': len(tag_ids),
+            'recipes': len(recipe_ids),
+            'ingredient_rows': ingredient_rows,
+            'follows': follows,
+            'favorites': favorites,
+            'shopping_cart': cart,
+        }
+
+    def sample_size(self, bounds, population):
+        low, high = bounds
+        return min(self.random.randint(low, high), population)
+
+    def bulk_create(self, model, objects, **kwargs):
+        created = model.objects.bulk_create(
+            objects, batch_size=self.batch_size, **kwargs)
+        self.log(f'{model._meta.verbose_name_plural}: {len(objects)}')
+        return created
+
+    def create_users(self):
+        password = make_password(DATASET_PASSWORD)
+        users = self.bulk_create(User, [
+            User(
+                email=f'{self.prefix}-{index}@example.com',
+                username=f'{self.prefix}-{index}',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            )
+            for index in range(self.users)
+        ])
+        return [user.pk for user in users]
+
+    def create_tags(self):
+        tags = self.bulk_create(Tag, [
+            Tag(
+                name=f'{self.prefix}-tag-{index}',
+                slug=f'{self.prefix}-tag-{index}',
+                color=Tag.COLOR_PALETTE[
+                    index % len(Tag.COLOR_PALETTE)][0],
+            )
+            for index in range(self.tags)
+        ])
+        return [tag.pk for tag in tags]
+
+    def get_ingredients(self):
+        ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) >= self.ingredients_per_recipe[1]:
+            return ingredient_ids
+        ingredients = self.bulk_create(Ingredient, [
+            Ingredient(name=f'{self.prefix}-ингредиент-{index}',
+                       measurement_unit='г')
+            for index in range(max(100, self.ingredients_per_recipe[1]))
+        ])
+        return ingredient_ids + [ingredient.pk for ingredient in ingredients]
+
+    def create_recipes(self, user_ids):
+        recipe_ids = []
+        for start in range(0, self.recipes, self.batch_size):
+            stop = min(start + self.batch_size, self.recipes)
+            recipes = Recipe.objects.bulk_create([
+                Recipe(
+                    author_id=self.random.choice(user_ids),
+                    name=f'{self.random.choice(WORDS)} {index}',
+                    image='foodgram/media/dataset.png',
+                    text=' '.join(self.random.choices(WORDS, k=40)),
+                    cooking_time=self.random.randint(5, 180),
+                )
+                for index in range(start, stop)
+            ])
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            self.log(f'Рецепты: {stop}/{self.recipes}')
+        return recipe_ids
+
+    def create_recipe_tags(self, recipe_ids, tag_ids):
+        through = Recipe.tags.through
+        for start in range(0, len(recipe_ids), self.batch_size):
+            self.bulk_create(through, [
+                through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids[start:start + self.batch_size]
+                for tag_id in self.random.sample(
+                    tag_ids,
+                    self.sample_size(self.tags_per_recipe, len(tag_ids)))
+            ])
+
+    def create_recipe_ingredients(self, recipe_ids, ingredient_ids):
+        total = 0
+        for start in range(0, len(recipe_ids), self.batch_size):
+            rows = [
+                IngredInRecipe(recipe_id=recipe_id, ingredient_id=ingredient,
+                               amount=self.random.randint(1, 500))
+                for recipe_id in recipe_ids[start:start + self.batch_size]
+                for ingredient in self.random.sample(
+                    ingredient_ids,
+                    self.sample_size(self.ingredients_per_recipe,
+                                     len(ingredient_ids)))
+            ]
+            IngredInRecipe.objects.bulk_create(
+                rows, batch_size=self.batch_size)
+            total += len(rows)
+            self.log(f'Ингредиенты в рецептах: {total}')
+        return total
+
+    def create_user_links(self, model, field, user_ids, target_ids, count):
+        objects, total = [], 0
+        for user_id in user_ids:
+            targets = self.random.sample(
+                target_ids, min(count, len(target_ids)))
+            objects.extend(
+                model(user_id=user_id, **{field: target})
+                for target in targets
+                if not (field == 'author_id' and target == user_id)
+            )
+            if len(objects) >= self.batch_size:
+                total += len(self.bulk_create(model, objects))
+                objects = []
+        if objects:
+            total += len(self.bulk_create(model, objects))
+        return total
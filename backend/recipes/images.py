@@ -0,0 +1,167 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, features
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+IMAGES_DIR = 'recipes/images'
+RENDITIONS = {
+    'card': (480, 480),
+    'thumbnail': (160, 160),
+}
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+RENDITION_FORMAT, RENDITION_EXTENSION = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+)
+
+
+def detect_extension(head):
+    """
+    Тип картинки по первым байтам, без декодирования всего файла.
+    """
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def content_name(content, extension):
+    """
+    Имя файла по хэшу содержимого: одинаковые картинки хранятся один раз.
+    """
+    digest = sha256(content).hexdigest()
+    return f'{IMAGES_DIR}/{digest[:2]}/{digest}.{extension}'
+
+
+def is_content_addressed(name):
+    return bool(name) and name.startswith(f'{IMAGES_DIR}/')
+
+
+def rendition_name(name, rendition):
+    stem = name.rsplit('.', 1)[0]
+    return f'{stem}-{rendition}.{RENDITION_EXTENSION}'
+
+
+def verify_image(content):
+    """
+    Проверяет структуру файла без декодирования пикселей, поэтому
+    время запроса не зависит от размера картинки. Полностью
+    картинка декодируется в пуле при нарезке превью.
+    """
+    Image.open(BytesIO(content)).verify()
+
+
+class PendingImage:
+    """
+    Проверенная картинка, превью которой еще не нарезаны.
+    """
+    def __init__(self, name, content):
+        self.name = name
+        self.content = content
+
+    def schedule(self):
+        """
+        Оригинал сохраняется сразу, превью - в пуле после коммита.
+        """
+        if not default_storage.exists(self.name):
+            default_storage.save(self.name, ContentFile(self.content))
+        transaction.on_commit(lambda: enqueue(self.name))
+
+
+def missing_renditions(name):
+    return [
+        (rendition_name(name, rendition), size)
+        for rendition, size in RENDITIONS.items()
+        if not default_storage.exists(rendition_name(name, rendition))
+    ]
+
+
+def enqueue(name):
+    """
+    Одна и та же картинка обрабатывается в процессе только один раз:
+    повторная задача лишь просит текущую пройти еще круг, чтобы
+    отметить рецепты, сохраненные с этой картинкой после ее начала.
+    Задачи, потерянные при перезапуске, доделывает команда
+    process_images.
+    """
+    with _lock:
+        if name in _in_progress:
+            _in_progress[name] = True
+            return
+        _in_progress[name] = False
+    submit(process_image, name)
+
+
+def make_renditions(name):
+    missing = missing_renditions(name)
+    if not missing:
+        return 0
+    with default_storage.open(name) as file:
+        image = Image.open(BytesIO(file.read()))
+        image.load()
+    for target, size in missing:
+        copy = image.convert('RGB')
+        copy.thumbnail(size)
+        buffer = BytesIO()
+        copy.save(buffer, RENDITION_FORMAT, quality=85)
+        default_storage.save(target, ContentFile(buffer.getvalue()))
+    return len(missing)
+
+
+def mark_ready(name):
+    """
+    Рецепты с картинкой name начинают отдавать ссылки на превью.
+    """
+    return Recipe.objects.filter(
+        image=name, renditions_ready=False).update(renditions_ready=True)
+
+
+def process_image(name):
+    while True:
+        try:
+            make_renditions(name)
+            mark_ready(name)
+        except Exception:
+            logger.exception('Не удалось нарезать превью %s', name)
+        with _lock:
+            if not _in_progress.pop(name):
+                return
+            _in_progress[name] = False
+
+
+_executor = None
+_in_progress = {}
+_lock = Lock()
+
+
+def submit(func, *args):
+    """
+    Выполняет задачу в пуле потоков; при IMAGE_WORKERS = 0 - сразу.
+    """
+    global _executor
+    workers = getattr(settings, 'IMAGE_WORKERS', 2)
+    if not workers:
+        return func(*args)
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='images')
+    return _executor.submit(func, *args)
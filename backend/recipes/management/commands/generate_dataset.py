@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from recipes.dataset import DATASET_PASSWORD, DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = ('Генерирует синтетические данные: пользователей, подписки, '
+            'теги, рецепты с ингредиентами, избранное и корзины.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=8)
+        parser.add_argument('--min-ingredients', type=int, default=5)
+        parser.add_argument('--max-ingredients', type=int, default=40)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Рецептов в избранном на пользователя.')
+        parser.add_argument('--cart', type=int, default=5,
+                            help='Рецептов в корзине на пользователя.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix')
+
+    def handle(self, *args, **options):
+        summary = DatasetGenerator(
+            users=options['users'],
+            recipes=options['recipes'],
+            tags=options['tags'],
+            ingredients_per_recipe=(options['min_ingredients'],
+                                    options['max_ingredients']),
+            follows_per_user=options['follows'],
+            favorites_per_user=options['favorites'],
+            cart_per_user=options['cart'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            log=self.stdout.write,
+        ).generate()
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{key}={value}' for key, value in summary.items())))
+        self.stdout.write(f'Пароль пользователей: {DATASET_PASSWORD}')
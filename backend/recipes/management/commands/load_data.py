@@ -0,0 +1,127 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Ingredient, Tag
+
+from api.cache import bump_version
+
+FIELDS = {
+    'ingredients': (Ingredient, ('name', 'measurement_unit')),
+    'tags': (Tag, ('name', 'color', 'slug')),
+}
+
+
+def normalize(value):
+    return ' '.join(str(value).split())
+
+
+def normalize_ingredient(name, measurement_unit):
+    return normalize(name), normalize(measurement_unit)
+
+
+def normalize_tag(name, color, slug):
+    return normalize(name), normalize(color).upper(), normalize(slug)
+
+
+def iter_json_array(file, chunk_size=1 << 16):
+    """
+    Читает JSON-массив объектов по частям, не загружая файл целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив.')
+    buffer, eof = buffer[1:], False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Неверный JSON.')
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+NORMALIZERS = {
+    Ingredient: normalize_ingredient,
+    Tag: normalize_tag,
+}
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты или теги из CSV, JSON или JSON Lines. '
+            'Повторный запуск не создает дублей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', type=Path)
+        parser.add_argument('--model', choices=FIELDS, default='ingredients')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        model, fields = FIELDS[options['model']]
+        for path in options['paths']:
+            if not path.exists():
+                raise CommandError(f'Файл не найден: {path}')
+            rows = self.read(path, model, fields)
+            processed = created = 0
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                created += self.upsert(model, fields, batch)
+                processed += len(batch)
+                self.stdout.write(f'{path.name}: обработано {processed}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{path.name}: строк {processed}, добавлено {created}'))
+            # bulk_create не шлет сигналы: кэш справочника сбрасываем сами.
+            if created:
+                bump_version(model)
+
+    def read(self, path, model, fields):
+        normalizer = NORMALIZERS[model]
+        for item in self.read_items(path, fields):
+            values = normalizer(*(item.get(field, '') for field in fields))
+            if all(values):
+                yield values
+
+    def read_items(self, path, fields):
+        if path.suffix == '.csv':
+            with path.open(encoding='utf-8', newline='') as file:
+                for row in csv.reader(file):
+                    if row:
+                        yield dict(zip(fields, row))
+        elif path.suffix == '.jsonl':
+            with path.open(encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        yield self.fixture_fields(json.loads(line))
+        elif path.suffix == '.json':
+            with path.open(encoding='utf-8') as file:
+                for item in iter_json_array(file):
+                    yield self.fixture_fields(item)
+        else:
+            raise CommandError(f'Неподдерживаемый формат: {path.suffix}')
+
+    def fixture_fields(self, item):
+        return item.get('fields', item)
+
+    def upsert(self, model, fields, batch):
+        unique = set(batch)
+        lookup = {f'{fields[0]}__in': [values[0] for values in unique]}
+        before = model.objects.filter(**lookup).count()
+        model.objects.bulk_create(
+            (model(**dict(zip(fields, values))) for values in unique),
+            ignore_conflicts=True,
+        )
+        return model.objects.filter(**lookup).count() - before
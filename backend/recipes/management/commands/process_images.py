@@ -0,0 +1,33 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.images import (is_content_addressed, make_renditions,
+                            mark_ready)
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Нарезает недостающие превью картинок рецептов, например '
+            'после перезапуска воркера с недоделанными задачами.')
+
+    def handle(self, *args, **options):
+        names = (
+            Recipe.objects.exclude(image='')
+            .values_list('image', flat=True).distinct().iterator()
+        )
+        created = missing = failed = 0
+        for name in names:
+            if not is_content_addressed(name):
+                continue
+            if not default_storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет оригинала: {name}')
+                continue
+            try:
+                created += make_renditions(name)
+                mark_ready(name)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Ошибка {name}: {error}')
+        self.stdout.write(f'Превью создано: {created}, нет оригиналов: '
+                          f'{missing}, ошибок: {failed}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.cart import rebuild_cart
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает итоги списков покупок (CartIngredient) '
+            'по корзинам и составам рецептов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, nargs='*',
+                            help='id пользователей; по умолчанию все.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        created = rebuild_cart(options['users'], options['batch_size'])
+        self.stdout.write(f'Строк в итогах корзин: {created}')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счетчики избранного, корзин, рецептов '
+            'и подписчиков по фактическим данным.')
+
+    def handle(self, *args, **options):
+        for label, updated in rebuild_counters().items():
+            self.stdout.write(f'{label}: обновлено строк {updated}')
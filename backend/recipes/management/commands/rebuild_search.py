@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import refresh_search_document
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковые документы всех рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = refresh_search_document(
+            Recipe.objects.values_list('pk', flat=True).iterator(),
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковых документов обновлено: {total}'))
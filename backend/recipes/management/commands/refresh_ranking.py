@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ranking import refresh_ranking
+
+
+class Command(BaseCommand):
+    help = ('Обновляет рейтинги рецептов для сортировки '
+            'ordering=popular|trending. Запускается периодически.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рейтинги с нуля.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        summary = refresh_ranking(
+            full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги: добавлено {summary["created"]}, '
+            f'обновлено {summary["updated"]}'))
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:04
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS ingredient_name_trgm '
+            'ON recipes_ingredient USING gin (UPPER(name) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm')
+
+
+class Migration(migrations.Migration):
+    """
+    GIN-индекс по UPPER(name) обслуживает istartswith и icontains.
+    Индекс создается только в PostgreSQL и не попадает в состояние
+    моделей: SQLite не понимает классы операторов pg_trgm.
+    """
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
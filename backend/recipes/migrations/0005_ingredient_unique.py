@@ -0,0 +1,52 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredInRecipe = apps.get_model('recipes', 'IngredInRecipe')
+    duplicates = (
+        Ingredient.objects
+        .values('name', 'measurement_unit')
+        .annotate(count=models.Count('id'), keep=models.Min('id'))
+        .filter(count__gt=1)
+    )
+    for group in duplicates:
+        extra = list(
+            Ingredient.objects
+            .filter(name=group['name'],
+                    measurement_unit=group['measurement_unit'])
+            .exclude(id=group['keep'])
+            .values_list('id', flat=True)
+        )
+        rows = IngredInRecipe.objects.filter(
+            ingredient_id__in=extra).order_by('id')
+        for row in rows:
+            kept = IngredInRecipe.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=group['keep']).first()
+            if kept is None:
+                row.ingredient_id = group['keep']
+                row.save(update_fields=('ingredient',))
+            else:
+                kept.amount += row.amount
+                kept.save(update_fields=('amount',))
+                row.delete()
+        Ingredient.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='уникальный ингредиент'),
+        ),
+    ]
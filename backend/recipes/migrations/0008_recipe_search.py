@@ -0,0 +1,66 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:16
+
+from collections import defaultdict
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+def fill_search_document(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredInRecipe = apps.get_model('recipes', 'IngredInRecipe')
+    names = defaultdict(list)
+    rows = IngredInRecipe.objects.order_by('ingredient__name').values_list(
+        'recipe_id', 'ingredient__name')
+    for recipe_id, name in rows.iterator():
+        names[recipe_id].append(name)
+    recipes = []
+    for recipe in Recipe.objects.only('text').iterator():
+        recipe.search_document = ' '.join(names[recipe.pk] + [recipe.text])
+        recipes.append(recipe)
+    Recipe.objects.bulk_update(recipes, ('search_document',), batch_size=1000)
+    if schema_editor.connection.vendor == 'postgresql':
+        Recipe.objects.update(search_vector=(
+            SearchVector('name', weight='A', config='russian')
+            + SearchVector('search_document', weight='B', config='russian')
+        ))
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+    """
+    GIN-индекс по search_vector создается только в PostgreSQL,
+    как и индекс 0003: в SQLite поиск идет через индекс в памяти.
+    """
+
+    dependencies = [
+        ('recipes', '0007_recipe_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.1.7 on 2026-10-18 19:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_cart(apps, schema_editor):
+    CartIngredient = apps.get_model('recipes', 'CartIngredient')
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    totals = (
+        ShoppingList.objects
+        .order_by()
+        .values_list('user_id', 'recipe__ingredinrecipe__ingredient_id')
+        .annotate(total=models.Sum('recipe__ingredinrecipe__amount'))
+    )
+    CartIngredient.objects.bulk_create(
+        (CartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                        amount=total)
+         for user_id, ingredient_id, total in totals.iterator()
+         if ingredient_id is not None),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в корзине',
+                'verbose_name_plural': 'Ингредиенты в корзинах',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='уникальный ингредиент в корзине'),
+        ),
+        migrations.RunPython(fill_cart, migrations.RunPython.noop),
+    ]
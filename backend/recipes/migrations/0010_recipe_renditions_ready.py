@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+from recipes.images import is_content_addressed, missing_renditions
+
+
+def mark_ready(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    names = (
+        Recipe.objects.exclude(image='')
+        .values_list('image', flat=True).distinct()
+    )
+    ready = [
+        name for name in names
+        if is_content_addressed(name) and not missing_renditions(name)
+    ]
+    Recipe.objects.filter(image__in=ready).update(renditions_ready=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_cart_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Превью готовы'),
+        ),
+        migrations.RunPython(mark_ready, migrations.RunPython.noop),
+    ]
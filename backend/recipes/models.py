@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -56,6 +57,11 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='уникальный ингредиент'),
+        )
 
     def __str__(self):
         return f'{self.name} - {self.measurement_unit}'
@@ -98,11 +104,43 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В избранном',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В корзинах',
+    )
+    renditions_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Превью готовы',
+    )
+    search_document = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Поисковый документ',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name[:CUT_RECIPE_NAME]
@@ -150,6 +188,11 @@ class Favorite(models.Model):
         related_name='favorites',
         on_delete=models.CASCADE,
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Добавлено',
+    )
 
     class Meta:
         verbose_name = 'Избранный рецепт'
@@ -177,6 +220,11 @@ class ShoppingList(models.Model):
         related_name='shopping_cart',
         on_delete=models.CASCADE,
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Добавлено',
+    )
 
     class Meta:
         verbose_name = 'Рецепт в корзине'
@@ -189,3 +237,75 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в корзине у {self.user}'
+
+
+class CartIngredient(models.Model):
+    """
+    Итог по ингредиенту в корзине пользователя: сумма по всем
+    рецептам корзины. Поддерживается recipes.cart.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзинах'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='уникальный ингредиент в корзине'),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} x {self.amount} у {self.user}'
+
+
+class RecipeRank(models.Model):
+    """
+    Материализованный рейтинг рецепта, обновляется командой
+    refresh_ranking.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='rank',
+        verbose_name='Рецепт',
+    )
+    popular = models.FloatField(
+        default=0,
+        verbose_name='Популярность',
+    )
+    trending = models.FloatField(
+        default=0,
+        verbose_name='Популярность с затуханием',
+    )
+    refreshed_at = models.DateTimeField(
+        db_index=True,
+        verbose_name='Пересчитан',
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(fields=('-popular',), name='recipe_rank_popular_idx'),
+            models.Index(
+                fields=('-trending',), name='recipe_rank_trending_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.popular}, {self.trending}'
@@ -0,0 +1,128 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Favorite, Recipe, RecipeRank, ShoppingList
+
+EVENT_WEIGHTS = {
+    Favorite: 1.0,
+    ShoppingList: 2.0,
+}
+RANKINGS = {
+    'popular': 'rank__popular',
+    'trending': 'rank__trending',
+}
+EPOCH = datetime(2023, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_COMMIT_LAG = 60 * 5
+
+
+def log2_add(left, right):
+    """
+    log2(2 ** left + 2 ** right) без переполнения; None - пустая сумма.
+    """
+    if left is None:
+        return right
+    high, low = max(left, right), min(left, right)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def event_score(created, weight, half_life):
+    """
+    Вклад события в trending в логарифмической шкале.
+
+    Вес события растет вдвое за каждый период полураспада от EPOCH,
+    что равносильно затуханию всех старых событий: порядок рецептов
+    тот же, а уже посчитанные строки не нужно обновлять.
+    """
+    return ((created - EPOCH).total_seconds() / half_life
+            + math.log2(weight))
+
+
+def collect_trending(since, until):
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE', 60 * 60 * 72)
+    scores = {}
+    for model, weight in EVENT_WEIGHTS.items():
+        events = model.objects.filter(created__lte=until)
+        if since is not None:
+            events = events.filter(created__gt=since)
+        rows = events.values_list('recipe_id', 'created').iterator()
+        for recipe_id, created in rows:
+            scores[recipe_id] = log2_add(
+                scores.get(recipe_id), event_score(created, weight, half_life))
+    return scores
+
+
+def popular_score():
+    """
+    popular из счетчиков рецепта: подзапрос для UPDATE всех строк.
+    """
+    return Subquery(
+        Recipe.objects.filter(pk=OuterRef('recipe_id')).values(
+            score=F('favorites_count') * EVENT_WEIGHTS[Favorite]
+            + F('in_carts_count') * EVENT_WEIGHTS[ShoppingList])
+    )
+
+
+def refresh_ranking(full=False, batch_size=5000):
+    """
+    Обновляет рейтинги рецептов с новыми событиями с прошлого запуска.
+
+    trending досуммируется событиями после отметки refreshed_at.
+    Отметка отстает от текущего времени на RANKING_COMMIT_LAG:
+    событие со временем до отметки, чья транзакция закоммитилась
+    позже, попадет в следующий запуск, а не потеряется.
+    popular пересчитывается из счетчиков для всех строк одним UPDATE,
+    поэтому удаления из избранного и корзины тоже учитываются.
+    """
+    until = timezone.now() - timedelta(seconds=getattr(
+        settings, 'RANKING_COMMIT_LAG', DEFAULT_COMMIT_LAG))
+    since = None
+    if not full:
+        since = RecipeRank.objects.aggregate(
+            last=Max('refreshed_at'))['last']
+    trending = collect_trending(since, until)
+    recipe_ids = sorted(trending)
+    created = updated = 0
+    with transaction.atomic():
+        if full:
+            RecipeRank.objects.all().delete()
+        for start in range(0, len(recipe_ids), batch_size):
+            batch = recipe_ids[start:start + batch_size]
+            existing = {}
+            if not full:
+                existing = dict(
+                    RecipeRank.objects.filter(recipe_id__in=batch)
+                    .values_list('recipe_id', 'trending')
+                )
+            new, changed = [], []
+            for recipe_id in Recipe.objects.filter(
+                    pk__in=batch).values_list('pk', flat=True):
+                rank = RecipeRank(
+                    recipe_id=recipe_id,
+                    trending=log2_add(
+                        existing.get(recipe_id), trending[recipe_id]),
+                    refreshed_at=until,
+                )
+                if recipe_id in existing:
+                    changed.append(rank)
+                else:
+                    new.append(rank)
+            RecipeRank.objects.bulk_create(new)
+            RecipeRank.objects.bulk_update(
+                changed, ('trending', 'refreshed_at'))
+            created += len(new)
+            updated += len(changed)
+        RecipeRank.objects.update(popular=popular_score())
+    return {'created': created, 'updated': updated}
+
+
+def order_by_rank(queryset, ranking):
+    """
+    Сортирует рецепты по рейтингу; рецепты без рейтинга - в конце.
+    """
+    return queryset.order_by(
+        F(RANKINGS[ranking]).desc(nulls_last=True), '-pub_date', '-id')
@@ -0,0 +1,45 @@
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchVector
+from django.db import connection
+
+from .models import IngredInRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+SEARCH_VECTOR = (
+    SearchVector('name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('search_document', weight='B', config=SEARCH_CONFIG)
+)
+
+
+def build_document(text, ingredient_names):
+    return ' '.join(list(ingredient_names) + [text])
+
+
+def refresh_search_document(recipe_ids, batch_size=1000):
+    """
+    Пересобирает поисковый документ рецептов: ингредиенты и описание.
+
+    Название в документ не входит: в tsvector оно попадает отдельно
+    с весом A. В PostgreSQL заодно обновляется search_vector.
+    """
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        names = defaultdict(list)
+        rows = (
+            IngredInRecipe.objects.filter(recipe_id__in=batch)
+            .order_by('ingredient__name')
+            .values_list('recipe_id', 'ingredient__name')
+        )
+        for recipe_id, name in rows:
+            names[recipe_id].append(name)
+        recipes = list(Recipe.objects.filter(pk__in=batch).only('text'))
+        for recipe in recipes:
+            recipe.search_document = build_document(
+                recipe.text, names[recipe.pk])
+        Recipe.objects.bulk_update(recipes, ('search_document',))
+        if connection.vendor == 'postgresql':
+            Recipe.objects.filter(pk__in=batch).update(
+                search_vector=SEARCH_VECTOR)
+    return len(recipe_ids)
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from functools import lru_cache
+
+TO_TASTE = 'по вкусу'
+UNITS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'стакан': ('мл', 250),
+    'ст. л.': ('мл', 15),
+    'ч. л.': ('мл', 5),
+    'капля': ('мл', 0.05),
+}
+DENSITIES = {
+    'вода': 1.0,
+    'крахмал': 0.65,
+    'мед': 1.4,
+    'молоко': 1.03,
+    'пекарский порошок': 1.0,
+    'растительное масло': 0.92,
+    'рис': 0.8,
+    'сахар': 0.8,
+    'сметана': 1.0,
+    'соль': 1.3,
+}
+
+
+@lru_cache(maxsize=None)
+def convert(name, unit):
+    """
+    Каноническая единица и множитель для пары ингредиент/единица.
+
+    Объем переводится в граммы, если для ингредиента известна
+    плотность (г/мл). None - единицу не с чем объединять.
+    Результат запоминается: таблица пересчета строится по ходу.
+    """
+    canonical = UNITS.get(unit)
+    if canonical is None:
+        return None
+    unit, factor = canonical
+    density = DENSITIES.get(name)
+    if unit == 'мл' and density is not None:
+        return 'г', factor * density
+    return unit, factor
+
+
+def format_amount(amount):
+    amount = round(amount, 2)
+    return int(amount) if amount == int(amount) else amount
+
+
+def merge_group(name, rows):
+    if len(rows) == 1:
+        return rows
+    totals = OrderedDict()
+    for row in rows:
+        unit, total = row['measurement_unit'], row['total']
+        conversion = convert(name, unit)
+        if conversion is not None:
+            unit, factor = conversion
+            total *= factor
+        totals[unit] = totals.get(unit, 0) + total
+    return [
+        {'name': name, 'measurement_unit': unit,
+         'total': format_amount(total)}
+        for unit, total in totals.items()
+    ]
+
+
+def merge_units(rows):
+    """
+    Объединяет строки списка покупок с совместимыми единицами.
+
+    Строки приходят отсортированными по названию, поэтому хватает
+    одного прохода и буфера на строки одного ингредиента. Позиции
+    "по вкусу" не суммируются с остальными и выводятся в конце.
+    """
+    to_taste, group, current = [], [], None
+    for row in rows:
+        if row['measurement_unit'] == TO_TASTE:
+            to_taste.append(row)
+            continue
+        if row['name'] != current:
+            if group:
+                yield from merge_group(current, group)
+            group, current = [], row['name']
+        group.append(row)
+    if group:
+        yield from merge_group(current, group)
+    yield from to_taste
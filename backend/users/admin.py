@@ -19,6 +19,10 @@ class UserAdmin(admin.ModelAdmin):
         'email',
         'username',
     )
+    readonly_fields = (
+        'recipes_count',
+        'followers_count',
+    )
     empty_value_display = '-пусто-'
 
 
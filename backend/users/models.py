@@ -28,6 +28,14 @@ class User(AbstractUser):
         max_length=150,
         verbose_name='Пароль'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']